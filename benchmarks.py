@@ -0,0 +1,949 @@
+"""Benchmarks for enrollment.py
+
+usage:
+    python benchmarks.py run [--scale 1k 100k 1m] [--seed 0] [--output bench_results.json]
+    python benchmarks.py compare OLD.json NEW.json
+    python benchmarks.py generate enrollment.db [--scale 100k] [--seed 0]
+    python benchmarks.py lookups [-n 2000] [--db enrollment.db]
+    python benchmarks.py plans [--scale 200k]
+    python benchmarks.py async [--requests 500] [--distinct 20] [--workers 8]
+    python benchmarks.py snapshot [--scale 100k]
+    python benchmarks.py seats [--threads 16] [--students 2000] [--capacity 100]
+    python benchmarks.py bulk [--scale 500k] [--format csv]
+    python benchmarks.py timetables [--scale 100k] [--format txt]
+    python benchmarks.py instrument
+    python benchmarks.py records [--students 1000000]
+    python benchmarks.py session [--students 2000]
+    python benchmarks.py statements [-n 5000]
+    python benchmarks.py reports [--scale 100k] [--workers 3]
+    python benchmarks.py charts [--scale 100k]
+    python benchmarks.py cdc [--scale 100k]
+    python benchmarks.py roster [--scale 1m]
+    python benchmarks.py importtime
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("MPLBACKEND", "Agg")  # plt.show() in the plotting reports must not block
+
+import enrollment
+
+SCHEDULES = ["MWF 8:00-9:00", "MWF 9:00-10:00", "MWF 10:00-11:00", "MWF 1pm-2pm",
+             "TTh 8:30-10:00", "TTh 10:00-11:30", "TTh 1pm-2:30pm", "TTh 3pm-4:30pm"]
+UNIT_CHOICES = [1, 2, 3, 3, 3, 3, 4, 5]
+
+
+def time_per_call(fn, args_list):
+    # average seconds per call over args_list
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+
+def bench_lookups(n=2000):
+    """Point-lookup latency: pandas DataFrame path vs the fetch_query row path"""
+    import pandas as pd
+
+    lookups = {
+        "departments": ("dept_id", "get_dept"),
+        "professors": ("prof_id", "get_prof"),
+        "students": ("student_id", "get_student"),
+        "courses": ("course_code", "get_course"),
+        "enrollments": ("enrollment_no", "get_enrollment"),
+    }
+    results = {}
+    for table, (key, name) in lookups.items():
+        ids = [row[0] for row in enrollment.conn.execute(f"SELECT {key} FROM {table} LIMIT 1000")]
+        if not ids:
+            print(f"{table}: no rows, skipped")
+            continue
+        query = enrollment.QUERIES[name]
+        args_list = [(ids[i % len(ids)],) for i in range(n)]
+
+        def pandas_path(value):
+            return pd.read_sql_query(query, enrollment.conn.connect(), params={key: value}).to_dict(orient='records')[0]
+
+        def fast_path(value):
+            return enrollment.fetch_query(name, {key: value})
+
+        pandas_us = time_per_call(pandas_path, args_list) * 1e6
+        fast_us = time_per_call(fast_path, args_list) * 1e6
+        results[table] = {"pandas_us": pandas_us, "fetch_query_us": fast_us}
+        print(f"{table:<12} pandas {pandas_us:8.1f} us/lookup   fetch_query {fast_us:6.1f} us/lookup"
+              f"   ({pandas_us / fast_us:.0f}x)")
+    return results
+
+
+def parse_scale(text):
+    # "1k" -> 1000, "1m" -> 1000000
+    text = text.lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def generate_data(enrollments=1000, seed=0):
+    """Fills the current enrollment.conn with a reproducible synthetic dataset
+
+    Table sizes scale with the number of enrollments (about 4 courses per
+    student) and every student stays within MAX_UNITS.
+    """
+    rng = random.Random(seed)
+    students = max(10, enrollments // 4)
+    courses = max(20, enrollments // 500)
+    depts = max(3, min(50, courses // 20))
+    profs = max(depts, courses // 3)
+
+    c = enrollment.conn
+    with c:
+        c.executemany("INSERT INTO departments (name) VALUES (?)", [(f"Dept {i}",) for i in range(depts)])
+        c.executemany("INSERT INTO professors (name, dept_id) VALUES (?, ?)",
+                      [(f"Prof {i}", rng.randint(1, depts)) for i in range(profs)])
+        c.executemany("INSERT INTO students (name, age, dept_id) VALUES (?, ?, ?)",
+                      [(f"Student {i}", rng.randint(17, 30), rng.randint(1, depts)) for i in range(students)])
+        course_units = [rng.choice(UNIT_CHOICES) for _ in range(courses)]
+        c.executemany("INSERT INTO courses (name, prof_id, dept_id, units, schedule) VALUES (?, ?, ?, ?, ?)",
+                      [(f"Course {i}", rng.randint(1, profs), rng.randint(1, depts), course_units[i],
+                        rng.choice(SCHEDULES)) for i in range(courses)])
+        enrollment.sync_course_slots()
+
+        pairs = []
+        for student_id in range(1, students + 1):
+            # spread what's left evenly over the remaining students
+            wanted = -(-(enrollments - len(pairs)) // (students - student_id + 1))
+            units = 0
+            for course_code in rng.sample(range(1, courses + 1), min(courses, wanted + 3)):
+                if wanted == 0:
+                    break
+                if units + course_units[course_code - 1] <= enrollment.MAX_UNITS:
+                    units += course_units[course_code - 1]
+                    pairs.append((student_id, course_code))
+                    wanted -= 1
+        c.executemany("INSERT INTO enrollments (student_id, course_code) VALUES (?, ?)", pairs)
+
+    return {"departments": depts, "professors": profs, "students": students,
+            "courses": courses, "enrollments": len(pairs)}
+
+
+@contextlib.contextmanager
+def quiet():
+    # the CRUD methods print on every call; keep that out of the timings' output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def seeded_db(enrollments, seed=0, **options):
+    """Opens a fresh database in a temporary directory as enrollment.conn, filled by generate_data()
+
+    Yields the directory, for files written next to the database; options go to
+    open_db(). The connections are closed on the way out.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        enrollment.open_db(os.path.join(tmp, "bench.db"), **options)
+        try:
+            with quiet():
+                generate_data(enrollments, seed)
+            yield tmp
+        finally:
+            enrollment.conn.close_all()
+
+
+def time_calls(fn, args_list):
+    start = time.perf_counter()
+    with quiet():
+        for args in args_list:
+            fn(*args)
+    total = time.perf_counter() - start
+    return {"calls": len(args_list), "total_s": total, "per_call_us": total / len(args_list) * 1e6}
+
+
+def max_id(table):
+    key = enrollment.PRIMARY_KEYS[table]
+    return enrollment.conn.execute(f"SELECT IFNULL(MAX({key}), 0) FROM {table}").fetchone()[0]
+
+
+def crud_cases(n, rng):
+    """(name, fn, args_list) for every CRUD method; writes only touch rows they created"""
+    E = enrollment
+    depts, profs, courses = max_id("departments"), max_id("professors"), max_id("courses")
+
+    def new_ids(table, before):
+        # ids are AUTOINCREMENT, so deleted ones are not reused: ask for them
+        key = E.PRIMARY_KEYS[table]
+        return [row[0] for row in E.conn.execute(f"SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key}",
+                                                 (before,))]
+
+    # each group runs add -> get -> update -> delete on its own fresh rows
+    def department():
+        before = max_id("departments")
+        yield "Department.add_dept", E.Department.add_dept, [(f"Bench dept {before + i}",) for i in range(n)]
+        yield "Department.add_depts", E.Department.add_depts, [([f"Bench dept {before + n + i}" for i in range(n)],)]
+        ids = new_ids("departments", before)
+        yield "Department.get_dept", E.Department.get_dept, [(rng.randint(1, depts),) for _ in range(n)]
+        yield "Department.get_depts", E.Department.get_depts, [(None,)]
+        yield "Department.update_dept", E.Department.update_dept, [(i, f"Renamed dept {i}") for i in ids[:n]]
+        yield "Department.update_depts", E.Department.update_depts, [([(f"Renamed dept {i}", i) for i in ids[n:]],)]
+        yield "Department.del_dept", E.Department.del_dept, [(i,) for i in ids[:n]]
+        yield "Department.del_depts", E.Department.del_depts, [(ids[n:],)]
+
+    def professor():
+        before = max_id("professors")
+        yield "Professor.add_prof", E.Professor.add_prof, [(f"Bench prof {i}", rng.randint(1, depts)) for i in range(n)]
+        yield "Professor.add_profs", E.Professor.add_profs, [([(f"Bench prof {i}", rng.randint(1, depts))
+                                                               for i in range(n)],)]
+        ids = new_ids("professors", before)
+        yield "Professor.get_prof", E.Professor.get_prof, [(rng.randint(1, profs),) for _ in range(n)]
+        yield "Professor.get_profs", E.Professor.get_profs, [(None,)]
+        yield "Professor.update_prof", E.Professor.update_prof, [(i, f"Renamed prof {i}") for i in ids[:n]]
+        yield "Professor.update_profs", E.Professor.update_profs, [([(f"Renamed prof {i}", i) for i in ids[n:]],)]
+        yield "Professor.del_prof", E.Professor.del_prof, [(i,) for i in ids[:n]]
+        yield "Professor.del_profs", E.Professor.del_profs, [(ids[n:],)]
+
+    def student():
+        students = max_id("students")
+        before = students
+        yield "Student.add_student", E.Student.add_student, [(f"Bench student {i}", 20, rng.randint(1, depts))
+                                                             for i in range(n)]
+        yield "Student.add_students", E.Student.add_students, [([(f"Bench student {i}", 20, rng.randint(1, depts))
+                                                                 for i in range(n)],)]
+        ids = new_ids("students", before)
+        yield "Student.get_student", E.Student.get_student, [(rng.randint(1, students),) for _ in range(n)]
+        yield "Student.get_students", E.Student.get_students, [(None,)]
+        yield "Student.update_student", E.Student.update_student, [(i, f"Renamed {i}", 21) for i in ids[:n]]
+        yield "Student.update_students", E.Student.update_students, [([(f"Renamed {i}", 21, i) for i in ids[n:]],)]
+        yield "Student.del_student", E.Student.del_student, [(i,) for i in ids[:n]]
+        yield "Student.del_students", E.Student.del_students, [(ids[n:],)]
+
+    def course():
+        before = max_id("courses")
+        def row(i):
+            return (f"Bench course {i}", rng.randint(1, profs), rng.randint(1, depts), 3, rng.choice(SCHEDULES))
+        yield "Course.add_course", E.Course.add_course, [row(i) for i in range(n)]
+        yield "Course.add_courses", E.Course.add_courses, [([row(i) for i in range(n)],)]
+        ids = new_ids("courses", before)
+        yield "Course.get_course", E.Course.get_course, [(rng.randint(1, courses),) for _ in range(n)]
+        yield "Course.get_courses", E.Course.get_courses, [(None,)]
+        yield "Course.update_course", E.Course.update_course, [(i, f"Renamed course {i}", 3, rng.choice(SCHEDULES))
+                                                               for i in ids[:n]]
+        yield "Course.update_courses", E.Course.update_courses, [([(f"Renamed course {i}", 3, rng.choice(SCHEDULES), i)
+                                                                   for i in ids[n:]],)]
+        yield "Course.del_course", E.Course.del_course, [(i,) for i in ids[:n]]
+        yield "Course.del_courses", E.Course.del_courses, [(ids[n:],)]
+
+    def enrollment_():
+        # fresh students so the unit cap never gets in the way
+        before = max_id("students")
+        with quiet():
+            E.Student.add_students([(f"Bench enrollee {i}", 20, 1) for i in range(2 * n)])
+        students = new_ids("students", before)
+        enrollments = max_id("enrollments")
+        yield "Enrollment.add_enrollment", E.Enrollment.add_enrollment, [(i, rng.randint(1, courses))
+                                                                         for i in students[:n]]
+        yield "Enrollment.add_enrollments", E.Enrollment.add_enrollments, [([(i, rng.randint(1, courses))
+                                                                             for i in students[n:]],)]
+        ids = new_ids("enrollments", enrollments)
+        yield "Enrollment.get_enrollment", E.Enrollment.get_enrollment, [(rng.randint(1, enrollments),)
+                                                                         for _ in range(n)]
+        yield "Enrollment.get_enrollments", E.Enrollment.get_enrollments, [(None,)]
+        half = len(ids) // 2
+        yield "Enrollment.del_enrollment", E.Enrollment.del_enrollment, [(i,) for i in ids[:half]]
+        yield "Enrollment.del_enrollments", E.Enrollment.del_enrollments, [(ids[half:],)]
+
+    for group in (department, professor, student, course, enrollment_):
+        yield from group()
+
+
+def batch_cases(rng, batch_sizes=(100, 1000, 10000)):
+    """add_enrollments with growing batches of fresh students"""
+    E = enrollment
+    courses = max_id("courses")
+    for size in batch_sizes:
+        before = max_id("students")
+        with quiet():
+            E.Student.add_students([(f"Batch student {i}", 20, 1) for i in range(size)])
+        students = [row[0] for row in E.conn.execute("SELECT student_id FROM students WHERE student_id > ?", (before,))]
+        pairs = [(student_id, rng.randint(1, courses)) for student_id in students]
+        yield f"Enrollment.add_enrollments[{size}]", E.Enrollment.add_enrollments, [(pairs,)]
+
+
+def report_cases(n, rng, repeat=3):
+    E = enrollment
+    students = max_id("students")
+    yield "course_roster", E.course_roster, [()] * repeat
+    yield "student_timetable", E.student_timetable, [(rng.randint(1, students),) for _ in range(n)]
+    yield "department_summary", E.department_summary, [()] * repeat
+    yield "analyze_enrollment_by_department", E.analyze_enrollment_by_department, [()] * repeat
+
+
+def run_benchmarks(scales=("1k",), seed=0, n=200, output="bench_results.json"):
+    """Times every CRUD method, add_enrollments batches and the reports at each scale, saves JSON"""
+    results = {}
+    for scale in scales:
+        rng = random.Random(seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            enrollment.open_db(os.path.join(tmp, "bench.db"))
+            start = time.perf_counter()
+            with quiet():
+                sizes = generate_data(parse_scale(scale), seed)
+            scale_results = {"sizes": sizes, "generate_s": time.perf_counter() - start, "ops": {}}
+            print(f"[{scale}] generated {sizes} in {scale_results['generate_s']:.1f}s")
+
+            cases = [crud_cases(n, rng), batch_cases(rng), report_cases(max(1, n // 10), rng)]
+            for group in cases:
+                for name, fn, args_list in group:
+                    try:
+                        timing = time_calls(fn, args_list)
+                        print(f"[{scale}] {name:<40} {timing['per_call_us']:12.1f} us/call")
+                    except Exception as e:  # keep going, record the failure in the results
+                        timing = {"error": f"{type(e).__name__}: {e}"}
+                        print(f"[{scale}] {name:<40} ERROR {timing['error']}")
+                    scale_results["ops"][name] = timing
+            enrollment.conn.close_all()
+        results[scale] = scale_results
+
+    report = {"meta": run_metadata(seed), "results": results}
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {output}")
+    return report
+
+
+def run_metadata(seed):
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "seed": seed, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform()}
+
+
+def compare(old_path, new_path, threshold=1.2):
+    """Prints per-op ratios between two run_benchmarks JSON files, flags slowdowns"""
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    for scale in sorted(set(old) & set(new)):
+        for name, timing in new[scale]["ops"].items():
+            before = old[scale]["ops"].get(name, {})
+            if "per_call_us" not in timing or "per_call_us" not in before:
+                continue
+            ratio = timing["per_call_us"] / before["per_call_us"]
+            flag = "  SLOWER" if ratio > threshold else ""
+            regressions += ratio > threshold
+            print(f"[{scale}] {name:<40} {before['per_call_us']:12.1f} -> {timing['per_call_us']:12.1f} us"
+                  f"  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def check_plans(scale="200k"):
+    """Regression check: fails if a report query falls back to a full-table scan"""
+    with seeded_db(parse_scale(scale)):
+        plans = enrollment.explain()
+
+    failed = {name: plan["scans"] for name, plan in plans.items() if plan["scans"]}
+    if failed:
+        print(f"FAILED: {len(failed)} report(s) fall back to a full-table scan")
+        return 1
+    print("all report queries use indexes")
+    return 0
+
+
+def bench_import_time(runs=5):
+    """Cold import cost of enrollment.py, measured with python -X importtime"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    totals = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import enrollment"],
+                              cwd=here, capture_output=True, text=True, check=True)
+        # lines look like: "import time:  self [us] | cumulative | imported package"
+        timings = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            timings.append((int(cumulative_us), int(self_us), name.strip()))
+        totals.append(next(cumulative for cumulative, _, name in timings if name == "enrollment"))
+
+    print(f"import enrollment: best {min(totals) / 1000:.1f} ms, median "
+          f"{sorted(totals)[len(totals) // 2] / 1000:.1f} ms over {runs} runs")
+    print("slowest imports (last run):")
+    for cumulative, self_us, name in sorted(timings, reverse=True)[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    return {"best_ms": min(totals) / 1000, "runs_ms": [total / 1000 for total in totals]}
+
+
+def bench_async(requests=500, distinct=20, workers=8, scale="20k"):
+    """Concurrent requests through AsyncEnrollment vs calling the sync API inside the loop
+
+    A ticker task measures how long the event loop stalls while the requests run.
+    """
+    import asyncio
+
+    async def ticker(stop, lags, interval=0.005):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    async def serve(handler):
+        stop, lags = asyncio.Event(), []
+        tick = asyncio.create_task(ticker(stop, lags))
+        await asyncio.sleep(0)
+        rng = random.Random(0)
+        start = time.perf_counter()
+        with quiet():
+            await asyncio.gather(*(handler(rng.randint(1, distinct)) for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await tick
+        return {"requests": requests, "total_s": elapsed, "max_loop_lag_ms": max(lags, default=0) * 1000}
+
+    async def sync_handler(student_id):
+        return enrollment.student_timetable(student_id)
+
+    async def main():
+        results = {"sync": await serve(sync_handler)}
+        async with enrollment.AsyncEnrollment(max_workers=workers) as service:
+            results["async"] = await serve(service.student_timetable)
+            results["async"]["coalesced"] = service.coalesced
+        return results
+
+    with seeded_db(parse_scale(scale)):
+        results = asyncio.run(main())
+
+    for name, r in results.items():
+        extra = f", {r['coalesced']} coalesced" if "coalesced" in r else ""
+        print(f"{name:>5}: {r['requests']} timetables in {r['total_s']:.2f}s, "
+              f"max loop stall {r['max_loop_lag_ms']:.1f} ms{extra}")
+    return results
+
+
+def bench_snapshot(scale="100k", repeat=5):
+    """Aggregate reports read live from SQLite vs from the memory-mapped snapshot"""
+    reports = ["department_summary", "plot_enrollment_by_department", "analyze_enrollment_by_department"]
+    results = {}
+    with seeded_db(parse_scale(scale)) as tmp:
+        with quiet():
+            start = time.perf_counter()
+            enrollment.build_snapshot(os.path.join(tmp, "snapshot"))
+            build_s = time.perf_counter() - start
+        enrollment.SNAPSHOT_PATH, old_path = os.path.join(tmp, "snapshot"), enrollment.SNAPSHOT_PATH
+        try:
+            for name in reports:
+                fn = getattr(enrollment, name)
+                live = time_calls(fn, [()] * repeat)
+                snap = time_calls(lambda: fn(live=False), [()] * repeat)
+                results[name] = {"live_ms": live["per_call_us"] / 1000, "snapshot_ms": snap["per_call_us"] / 1000}
+        finally:
+            enrollment.SNAPSHOT_PATH = old_path
+
+    print(f"snapshot built in {build_s * 1000:.0f} ms")
+    for name, r in results.items():
+        print(f"{name:<36} live {r['live_ms']:8.1f} ms   snapshot {r['snapshot_ms']:8.1f} ms")
+    return results
+
+
+def stress_seats(threads=16, students=2000, capacity=100, drops=50):
+    """Many threads registering for one popular course: checks it never overbooks
+
+    Every student asks for a seat with waitlist=True, then some enrolled students
+    drop concurrently and the waitlist must refill exactly the seats they free.
+    Returns the number of invariant violations.
+    """
+    E = enrollment
+    errors = []
+
+    def run_threads(work, items):
+        # each thread pulls items until none are left
+        lock, items = threading.Lock(), list(items)
+
+        def worker():
+            while True:
+                with lock:
+                    if not items:
+                        break
+                    item = items.pop()
+                try:
+                    work(item)
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+            E.conn.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        with quiet():
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+        return time.perf_counter() - start
+
+    with seeded_db(1000):
+        with quiet():
+            E.Course.add_course("Popular course", 1, 1, 3, "MWF 9:00-10:00", capacity=capacity)
+        course = max_id("courses")
+        before = max_id("students")
+        with quiet():
+            E.Student.add_students([(f"Applicant {i}", 20, 1) for i in range(students)])
+        applicants = [row[0] for row in E.conn.execute(
+            "SELECT student_id FROM students WHERE student_id > ?", (before,))]
+
+        def counts():
+            enrolled = E.conn.execute("SELECT COUNT(*) FROM enrollments WHERE course_code = ?", (course,)).fetchone()[0]
+            waiting = E.conn.execute("SELECT COUNT(*) FROM waitlist WHERE course_code = ?", (course,)).fetchone()[0]
+            return enrolled, waiting
+
+        elapsed = run_threads(lambda student_id: E.Enrollment.add_enrollment(student_id, course, waitlist=True),
+                              applicants)
+        enrolled, waiting = counts()
+        print(f"register: {students} students, {threads} threads: {students / elapsed:.0f} requests/s, "
+              f"{enrolled} enrolled, {waiting} waitlisted (capacity {capacity})")
+        violations = (enrolled != min(capacity, students)) + (enrolled + waiting != students)
+
+        drop_nos = [row[0] for row in E.conn.execute(
+            "SELECT enrollment_no FROM enrollments WHERE course_code = ? LIMIT ?", (course, drops))]
+        elapsed = run_threads(lambda enrollment_no: E.Enrollment.del_enrollments([enrollment_no]), drop_nos)
+        enrolled, after = counts()
+        print(f"drop: {len(drop_nos)} drops, {threads} threads: {len(drop_nos) / elapsed:.0f} drops/s, "
+              f"{enrolled} enrolled, {after} waitlisted")
+        violations += (enrolled != min(capacity, students)) + (after != max(0, waiting - len(drop_nos)))
+
+    for error in sorted(set(errors)):
+        print(f"error: {error}")
+    print("ok: never overbooked" if not violations and not errors else f"FAILED: {violations} violation(s)")
+    return violations + len(errors)
+
+
+def bench_bulk(scale="500k", fmt="csv", chunk_size=50000):
+    """Export every table of a generated database, then import it back with and without defer"""
+    E = enrollment
+    tables = ["departments", "professors", "students", "courses", "enrollments"]
+    results = {}
+    with seeded_db(parse_scale(scale)) as tmp:
+        with quiet():
+            results["export"] = {table: E.export_table(table, os.path.join(tmp, f"{table}.{fmt}"), chunk_size)
+                                 for table in tables}
+
+        for defer in (False, True):
+            E.open_db(os.path.join(tmp, f"import_{defer}.db"))  # closes the previous database
+            with quiet():
+                results[f"import defer={defer}"] = {
+                    table: E.import_table(table, os.path.join(tmp, f"{table}.{fmt}"), chunk_size, defer)
+                    for table in tables}
+
+    for name, per_table in results.items():
+        for table, r in per_table.items():
+            print(f"{name:<20} {table:<12} {r['rows']:>9} rows {r['seconds']:7.2f}s {r['rows_per_s']:10.0f} rows/s")
+    return results
+
+
+def bench_timetables(scale="100k", sample=500, workers=(0, 2, 4), fmt="txt"):
+    """Per-student student_timetable() vs one iter_timetables() pass, then rendering files"""
+    E = enrollment
+    with seeded_db(parse_scale(scale)) as tmp:
+        students = max_id("students")
+
+        single = time_calls(E.student_timetable, [(student_id,) for student_id in range(1, sample + 1)])
+        start = time.perf_counter()
+        count = sum(1 for _ in E.iter_timetables())
+        batched_us = (time.perf_counter() - start) / count * 1e6
+        print(f"student_timetable(): {single['per_call_us']:8.0f} us/student "
+              f"(~{single['per_call_us'] * students / 1e6:.0f}s for all {students})")
+        print(f"iter_timetables():   {batched_us:8.1f} us/student ({count} students in one query)")
+
+        results = {"single_us": single["per_call_us"], "batched_us": batched_us, "render": {}}
+        for n in workers:
+            with quiet():
+                r = E.render_timetables(os.path.join(tmp, f"out_{n}"), fmt, workers=n)
+            results["render"][n] = r
+            print(f"render {fmt}, workers={n}: {r['students'] / r['seconds']:8.0f} files/s")
+    return results
+
+
+def bench_reports(scale="100k", workers=3):
+    """The nightly reports back to back vs run_reports() on threads and on processes"""
+    E = enrollment
+    nightly = ["course_roster", "department_summary", "enrollment_by_department"]
+    results = {}
+    with seeded_db(parse_scale(scale)):
+        with quiet():
+            start = time.perf_counter()
+            # the same three queries back to back on the global connection
+            for name in ("course_roster", "department_summary", "enrollment_ranking"):
+                E.read_frame(name)
+            results["serial"] = time.perf_counter() - start
+            for processes in (False, True):
+                start = time.perf_counter()
+                E.run_reports(nightly, workers, processes=processes)
+                results["processes" if processes else "threads"] = time.perf_counter() - start
+
+    print(f"{len(nightly)} reports at {scale}, {os.cpu_count()} CPU(s)")
+    for name, seconds in results.items():
+        print(f"{name:<10} {seconds:6.2f}s")
+    return results
+
+
+def bench_charts(scale="100k", n=20):
+    """render_chart(): drawing every call vs the data-version and content-hash caches"""
+    E = enrollment
+    results = {}
+    with seeded_db(parse_scale(scale)):
+        E.render_chart()  # matplotlib's first-use imports and font cache
+
+        def timed(before=None):
+            start = time.perf_counter()
+            for _ in range(n):
+                if before:
+                    before()
+                E.render_chart()
+            return (time.perf_counter() - start) / n * 1000
+
+        results["uncached"] = timed(E.chart_cache.clear)
+        results["same version"] = timed()
+        # a write that bumps data_version but leaves the chart's data as it was
+        results["same data"] = timed(lambda: E.conn.run("bump_data_version"))
+
+    for name, ms in results.items():
+        print(f"{name:<13} {ms:8.2f} ms/chart")
+    return results
+
+
+def bench_cdc(scale="100k", changes=100):
+    """Syncing a consumer: re-pulling students and enrollments vs changes_since()"""
+    E = enrollment
+    results = {}
+    with seeded_db(parse_scale(scale)):
+        with quiet():
+            since = E.last_change_seq()
+            rng = random.Random(0)
+            students = max_id("students")
+            for i in range(changes):
+                E.Student.update_student(rng.randint(1, students), f"Renamed {i}", 20)
+
+        start = time.perf_counter()
+        pulled = len(list(E.Student.iter_students())) + len(list(E.Enrollment.iter_enrollments()))
+        results["full pull"] = time.perf_counter() - start
+        start = time.perf_counter()
+        applied = len(list(E.changes_since(since)))
+        results["changes_since"] = time.perf_counter() - start
+
+        # what the log costs writers: one bulk enrollment batch with and without its triggers
+        pairs = [(student_id, course_code) for student_id in range(1, 2001) for course_code in (1, 2)]
+        for label in ("with log", "without log"):
+            if label == "without log":
+                with E.conn:
+                    for (name,) in E.conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'change_log_enr%'"
+                                                  ).fetchall():
+                        E.conn.execute(f"DROP TRIGGER {name}")
+            with quiet():
+                E.Enrollment.del_enrollments([row[0] for row in E.conn.execute(
+                    "SELECT enrollment_no FROM enrollments WHERE course_code IN (1, 2)")])
+                start = time.perf_counter()
+                E.Enrollment.add_enrollments(pairs)
+                results[f"add_enrollments, {label}"] = time.perf_counter() - start
+
+    print(f"full pull:     {results['full pull'] * 1000:8.1f} ms ({pulled} rows)")
+    print(f"changes_since: {results['changes_since'] * 1000:8.1f} ms ({applied} changes)")
+    for label in ("with log", "without log"):
+        print(f"add_enrollments[{len(pairs)}], {label}: {results[f'add_enrollments, {label}'] * 1000:8.1f} ms")
+    return results
+
+
+def bench_roster(scale="1m", repeat=3):
+    """course_roster() modes, whole database and one course, plus counting from the full roster"""
+    E = enrollment
+    results = {}
+    with seeded_db(parse_scale(scale)):
+        course = max_id("courses") // 2
+
+        cases = {
+            "full": lambda: E.course_roster(),
+            "counts": lambda: E.course_roster(mode="counts"),
+            "paged, limit 50": lambda: E.course_roster(mode="paged", limit=50),
+            "full -> groupby count": lambda: E.course_roster().groupby("course_code")["student_name"].count(),
+            "one course, full": lambda: E.course_roster(course),
+            "one course, counts": lambda: E.course_roster(course, "counts"),
+            "one course, paged": lambda: E.course_roster(course, "paged", limit=50, offset=100),
+        }
+        for name, fn in cases.items():
+            results[name] = time_calls(fn, [()] * repeat)["per_call_us"] / 1000
+
+    print(f"course_roster at {scale}")
+    for name, ms in results.items():
+        print(f"{name:<22} {ms:9.1f} ms")
+    return results
+
+
+def bench_instrumentation(n=20000, scale="10k"):
+    """Cost of the instrumented() wrapper on a cached getter, disabled vs enabled"""
+    E = enrollment
+    with seeded_db(parse_scale(scale)):
+        args = [(1 + i % 3,) for i in range(n)]
+        raw = time_calls(E.lookup_dept, args)
+        disabled = time_calls(E.Department.get_dept, args)
+        E.enable_instrumentation(slow_ms=float("inf"))
+        enabled = time_calls(E.Department.get_dept, args)
+        E.disable_instrumentation()
+    print(f"lookup_dept (no wrapper, no print): {raw['per_call_us']:6.2f} us/call")
+    print(f"get_dept, instrumentation off:      {disabled['per_call_us']:6.2f} us/call")
+    print(f"get_dept, instrumentation on:       {enabled['per_call_us']:6.2f} us/call")
+    print(E.instrumentation_stats(reset=True).get("Department.get_dept"))
+    return {"raw": raw, "disabled": disabled, "enabled": enabled}
+
+
+def bench_records(students=1000000):
+    """Bytes per record and build time for students read as DataFrame dicts, dicts, tuples or Student objects"""
+    import gc
+    import tracemalloc
+    E = enrollment
+
+    def pandas_records():
+        import pandas as pd
+        return pd.read_sql_query("SELECT * FROM students", E.conn.connect()).to_dict("records")
+
+    paths = {
+        "pandas to_dict": pandas_records,
+        "dict rows": lambda: list(E.Student.iter_students(chunk_size=10000)),
+        "tuples": lambda: E.conn.execute("SELECT * FROM students").fetchall(),
+        "Student objects": lambda: list(E.Student.iter_students(chunk_size=10000, as_objects=True)),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        E.open_db(os.path.join(tmp, "records.db"))
+        with E.conn:
+            E.conn.execute("INSERT INTO departments (name) VALUES ('Dept')")
+            E.conn.executemany("INSERT INTO students (name, age, dept_id) VALUES (?, ?, 1)",
+                               ((f"Student {i}", 18 + i % 10) for i in range(students)))
+        if "pandas to_dict" in paths:
+            import pandas  # noqa: F401, keep the import itself out of the timings
+
+        for name, build in paths.items():
+            gc.collect()
+            start = time.perf_counter()
+            rows = build()
+            elapsed = time.perf_counter() - start
+            del rows
+            gc.collect()
+
+            tracemalloc.start()
+            rows = build()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = {"seconds": elapsed, "bytes_per_record": retained / len(rows),
+                             "peak_bytes_per_record": peak / len(rows)}
+            del rows
+        E.conn.close_all()
+
+    for name, r in results.items():
+        print(f"{name:<16} {r['seconds']:6.2f}s  {r['bytes_per_record']:6.0f} B/record retained, "
+              f"{r['peak_bytes_per_record']:6.0f} B/record peak")
+    return results
+
+
+def bench_session(students=2000, courses=100):
+    """A rollover-style script of single CRUD calls, one commit each vs one Session"""
+    E = enrollment
+    rng = random.Random(0)
+
+    def script(call):
+        dept = call(E.Department.add_dept, "Rollover")
+        profs = [call(E.Professor.add_prof, f"Prof {i}", dept) for i in range(courses // 5)]
+        codes = [call(E.Course.add_course, f"Course {i}", rng.choice(profs), dept, 3, rng.choice(SCHEDULES))
+                 for i in range(courses)]
+        ids = [call(E.Student.add_student, f"Student {i}", 20, dept) for i in range(students)]
+        for student_id in ids:
+            call(E.Enrollment.add_enrollment, student_id, rng.choice(codes))
+        return 1 + len(profs) + len(codes) + 2 * len(ids)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        E.open_db(os.path.join(tmp, "plain.db"))
+        start = time.perf_counter()
+        with quiet():
+            ops = script(lambda fn, *args: fn(*args))
+        results["commit per call"] = time.perf_counter() - start
+        E.conn.close_all()
+
+        E.open_db(os.path.join(tmp, "session.db"))
+        start = time.perf_counter()
+        with E.Session() as session:
+            script(lambda fn, *args: session.run(fn, *args).value)
+        results["one Session"] = time.perf_counter() - start
+        summary = session.summary()
+        E.conn.close_all()
+
+    for name, seconds in results.items():
+        print(f"{name:<16} {ops} operations in {seconds:.2f}s ({ops / seconds:.0f} ops/s)")
+    print(f"session: {summary}")
+    return results
+
+
+def bench_statements(calls=5000):
+    """Repeated get_* and add_enrollment with no statement cache vs one sized for QUERIES"""
+    E = enrollment
+    results = {}
+    for size in (0, 256):
+        with seeded_db(2000, cached_statements=size):
+            E.configure_caches(capacity=0)  # time the SQL path, not the LRU caches
+            students, courses, enrollments = max_id("students"), max_id("courses"), max_id("enrollments")
+            first = students + 1
+            with quiet():
+                E.Student.add_students([(f"New {i}", 20, 1) for i in range(calls)])
+
+            timings = {
+                "get_student": time_calls(E.Student.get_student, [(i % students + 1,) for i in range(calls)]),
+                "get_course": time_calls(E.Course.get_course, [(i % courses + 1,) for i in range(calls)]),
+                "get_enrollment": time_calls(E.Enrollment.get_enrollment,
+                                             [(i % enrollments + 1,) for i in range(calls)]),
+                "add_enrollment": time_calls(E.Enrollment.add_enrollment,
+                                             [(first + i, i % courses + 1) for i in range(calls)]),
+            }
+            results[size] = {name: timing["per_call_us"] for name, timing in timings.items()}
+    E.configure_caches(capacity=1024)
+
+    print(f"{'operation':<16} {'uncached us':>12} {'cached us':>10}")
+    for name in results[0]:
+        print(f"{name:<16} {results[0][name]:>12.1f} {results[256][name]:>10.1f}"
+              f"   ({results[0][name] / results[256][name]:.1f}x)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="CRUD, batch and report timings on generated data, saved as JSON")
+    run.add_argument("--scale", nargs="+", default=["1k", "100k"], help="enrollment counts, e.g. 1k 100k 1m")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("-n", type=int, default=200, help="calls per point operation")
+    run.add_argument("--output", default="bench_results.json")
+
+    comp = sub.add_parser("compare", help="compare two 'run' JSON files")
+    comp.add_argument("old")
+    comp.add_argument("new")
+    comp.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio to flag")
+
+    generate = sub.add_parser("generate", help="fill a database with synthetic data")
+    generate.add_argument("db")
+    generate.add_argument("--scale", default="100k")
+    generate.add_argument("--seed", type=int, default=0)
+
+    lookups = sub.add_parser("lookups", help="single-row getter latency")
+    lookups.add_argument("-n", type=int, default=2000, help="lookups per table")
+    lookups.add_argument("--db", default="enrollment.db", help="database to read from")
+
+    plans = sub.add_parser("plans", help="fail if a report query does a full-table scan")
+    plans.add_argument("--scale", default="200k", help="enrollments in the synthetic dataset")
+
+    aio = sub.add_parser("async", help="event-loop stall and throughput through AsyncEnrollment")
+    aio.add_argument("--requests", type=int, default=500)
+    aio.add_argument("--distinct", type=int, default=20, help="distinct students the requests ask for")
+    aio.add_argument("--workers", type=int, default=8)
+
+    snapshot = sub.add_parser("snapshot", help="aggregate reports live vs from the analytics snapshot")
+    snapshot.add_argument("--scale", default="100k")
+
+    seats = sub.add_parser("seats", help="threads racing for one course's seats, fails on overbooking")
+    seats.add_argument("--threads", type=int, default=16)
+    seats.add_argument("--students", type=int, default=2000)
+    seats.add_argument("--capacity", type=int, default=100)
+
+    bulk = sub.add_parser("bulk", help="streaming export/import throughput")
+    bulk.add_argument("--scale", default="500k")
+    bulk.add_argument("--format", default="csv", choices=["csv", "parquet"])
+
+    timetables = sub.add_parser("timetables", help="per-student vs batched timetables, parallel rendering")
+    timetables.add_argument("--scale", default="100k")
+    timetables.add_argument("--format", default="txt", choices=["txt", "csv", "html"])
+
+    sub.add_parser("instrument", help="overhead of the instrumentation wrapper")
+
+    records = sub.add_parser("records", help="memory and build time per student record")
+    records.add_argument("--students", type=int, default=1000000)
+
+    session = sub.add_parser("session", help="single CRUD calls committed one by one vs in one Session")
+    session.add_argument("--students", type=int, default=2000)
+
+    reports = sub.add_parser("reports", help="nightly reports serially vs run_reports() threads/processes")
+    reports.add_argument("--scale", default="100k")
+    reports.add_argument("--workers", type=int, default=3)
+
+    roster = sub.add_parser("roster", help="course_roster() full/counts/paged modes")
+    roster.add_argument("--scale", default="1m")
+
+    cdc = sub.add_parser("cdc", help="full re-pull vs changes_since(), and the log's write cost")
+    cdc.add_argument("--scale", default="100k")
+
+    charts = sub.add_parser("charts", help="render_chart() with and without its caches")
+    charts.add_argument("--scale", default="100k")
+
+    statements = sub.add_parser("statements", help="get_*/add_enrollment with the statement cache off vs on")
+    statements.add_argument("-n", type=int, default=5000)
+
+    importtime = sub.add_parser("importtime", help="python -X importtime for enrollment.py")
+    importtime.add_argument("--runs", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run_benchmarks(args.scale, args.seed, args.n, args.output)
+    elif args.command == "compare":
+        sys.exit(1 if compare(args.old, args.new, args.threshold) else 0)
+    elif args.command == "generate":
+        enrollment.open_db(args.db)
+        with quiet():
+            sizes = generate_data(parse_scale(args.scale), args.seed)
+        print(f"{args.db}: {sizes}")
+    elif args.command == "lookups":
+        enrollment.open_db(args.db)
+        bench_lookups(args.n)
+    elif args.command == "plans":
+        sys.exit(check_plans(args.scale))
+    elif args.command == "async":
+        bench_async(args.requests, args.distinct, args.workers)
+    elif args.command == "snapshot":
+        bench_snapshot(args.scale)
+    elif args.command == "seats":
+        sys.exit(1 if stress_seats(args.threads, args.students, args.capacity) else 0)
+    elif args.command == "bulk":
+        bench_bulk(args.scale, args.format)
+    elif args.command == "timetables":
+        bench_timetables(args.scale, fmt=args.format)
+    elif args.command == "instrument":
+        bench_instrumentation()
+    elif args.command == "records":
+        bench_records(args.students)
+    elif args.command == "session":
+        bench_session(args.students)
+    elif args.command == "reports":
+        bench_reports(args.scale, args.workers)
+    elif args.command == "roster":
+        bench_roster(args.scale)
+    elif args.command == "cdc":
+        bench_cdc(args.scale)
+    elif args.command == "charts":
+        bench_charts(args.scale)
+    elif args.command == "statements":
+        bench_statements(args.n)
+    elif args.command == "importtime":
+        bench_import_time(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,639 +1,3276 @@
-import sqlite3
-from sys import excepthook
-import pandas as pd
-import matplotlib.pyplot as plt
-
-conn = sqlite3.connect("enrollment.db")
-
-# --- TABLE CREATION ---
-
-# 1️⃣ Department Table
-conn.execute("""
-CREATE TABLE IF NOT EXISTS departments (
-dept_id INTEGER PRIMARY KEY AUTOINCREMENT,
-name TEXT NOT NULL UNIQUE)""")
-
-# 2️⃣ Professor Table
-conn.execute("""
-CREATE TABLE IF NOT EXISTS professors (
-prof_id INTEGER PRIMARY KEY AUTOINCREMENT,
-name TEXT NOT NULL,
-dept_id INTEGER NOT NULL,
-FOREIGN KEY(dept_id) REFERENCES departments(dept_id))""")
-
-# 3️⃣ Student Table
-conn.execute("""
-CREATE TABLE IF NOT EXISTS students (
-student_id INTEGER PRIMARY KEY AUTOINCREMENT,
-name TEXT NOT NULL,
-age INTEGER NOT NULL,
-dept_id INTEGER,
-FOREIGN KEY(dept_id) REFERENCES departments(dept_id))""")
-
-# 4️⃣ Course Table #course id/code
-conn.execute("""
-CREATE TABLE IF NOT EXISTS courses (
-course_code INTEGER PRIMARY KEY AUTOINCREMENT,
-name TEXT NOT NULL,
-prof_id INTEGER,
-dept_id INTEGER,
-units INTEGER NOT NULL DEFAULT 3,
-schedule text,
-FOREIGN KEY(prof_id) REFERENCES professors(prof_id),
-FOREIGN KEY(dept_id) REFERENCES departments(dept_id))""")
-
-# 5️⃣ Enrollment Table #enrollment id/no
-conn.execute("""
-CREATE TABLE IF NOT EXISTS enrollments (
-enrollment_no INTEGER PRIMARY KEY AUTOINCREMENT,
-student_id INTEGER NOT NULL,
-course_code INTEGER NOT NULL,
-UNIQUE(student_id, course_code),
-FOREIGN KEY(student_id) REFERENCES students(student_id),
-FOREIGN KEY(course_code) REFERENCES courses(course_code))""")
-
-conn.commit()
-
-# --- CLASSES ---
-class Department:
-    def __init__(self, name, dept_id=None):
-        self.dept_id = dept_id
-        self.name = name
-
-    #CREATE
-    @staticmethod #<---just preference for consistency of how i call my func
-    def add_dept(name):
-        with conn:
-            conn.execute("INSERT INTO departments (name) VALUES (?)", (name,))
-        print(f"Department of {name} added!")
-
-    def add_depts(dept_list):
-        #dept_list = ["CS", "Math", "Physics"]
-        with conn:
-            conn.executemany("INSERT INTO departments (name) VALUES (?)",[(name,) for name in dept_list])
-        print(f"Departments of {dept_list} added!")
-
-    # READ
-    def get_dept(dept_id):
-        try:
-            query = "SELECT * FROM departments WHERE dept_id = ?"
-            df = pd.read_sql_query(query, conn, params=(dept_id, )) #turning query to df
-
-            if df.empty:
-                print(f"No department found for dept_id={dept_id}")
-                return None
-
-            # Convert DataFrame to dict (records format gives a list of dicts)
-            dept_dict = df.to_dict(orient='records')[0]  # Get the first record
-            print(dept_dict)
-            return dept_dict
-
-        except Exception as e:
-            print("Database error:", e)
-            return None
-
-    def get_depts(self):
-        try:
-            query = "SELECT * FROM departments"
-            df = pd.read_sql_query(query, conn)
-
-            if df.empty:
-                print("No departments found.")
-                return []
-
-            dept_list = df.to_dict(orient='records')  # List of dictionaries
-            print(dept_list)
-            return dept_list
-
-        except Exception as e:
-            print("Database error:", e)
-            return []
-
-    # UPDATE
-    def update_dept(dept_id, name):
-        with conn:
-            conn.execute("UPDATE departments SET name=? WHERE dept_id=?", (name, dept_id))
-        print("update complete")
-
-    def update_depts(dept_list):
-        # dept_list = [(new_name, dept_id)]
-        with conn:
-            conn.executemany("UPDATE departments SET name = ? WHERE dept_id = ?", dept_list)
-        print("update complete")
-
-    # DELETE
-    def del_dept(dept_id):
-        with conn:
-            conn.execute("DELETE FROM departments WHERE dept_id=?", (dept_id,))
-        print("deletion complete")
-
-
-    def del_depts(dept_ids):
-        #del_depts([1, 3, 5])
-        with conn:
-            conn.executemany("DELETE FROM departments WHERE dept_id = ?",
-                         [(dept_id,) for dept_id in dept_ids])
-        print("deletion complete")
-
-class Professor:
-    def __init__(self,name, dept_id, prof_id=None):
-        self.prof_id = prof_id
-        self.name = name
-        self.dept_id = dept_id
-
-    # CREATE
-    @staticmethod
-    def add_prof(name, dept_id):
-        with conn:
-            conn.execute("INSERT INTO professors (name, dept_id) VALUES (?, ?)",
-                     (name, dept_id))
-        print(f"Professor {name} added!")
-
-    def add_profs(prof_list):
-        # prof_list = [(name, dept_id), (name, dept_id)]
-        with conn:
-            conn.executemany("INSERT INTO professors (name, dept_id) VALUES (?, ?)",prof_list)
-        print(f"Professors: {prof_list} added!")
-
-    # READ
-    def get_prof(prof_id):
-        try:
-            query = "SELECT * FROM professors WHERE prof_id = ?"
-            df = pd.read_sql_query(query, conn, params=(prof_id,))
-
-            if df.empty:
-                print(f"No professor found for prof_id={prof_id}")
-                return None
-
-            prof_dict = df.to_dict(orient='records')[0]
-            print(prof_dict)
-            return prof_dict
-
-        except Exception as e:
-            print("Database error:", e)
-            return None
-
-    def get_profs(self):
-        try:
-            query = "SELECT * FROM professors"
-            df = pd.read_sql_query(query, conn)
-
-            if df.empty:
-                print("No professors found.")
-                return []
-
-            prof_list = df.to_dict(orient='records')
-            print(prof_list)
-            return prof_list
-
-        except Exception as e:
-            print("Database error:", e)
-            return []
-
-    # UPDATE
-    def update_prof(prof_id, name):
-        with conn:
-            conn.execute("UPDATE professors SET name=? WHERE prof_id=?", (name, prof_id))
-        print("update complete")
-
-    def update_profs(prof_list):
-        # prof_list = [(new_name, prof_id)]
-        with conn:
-            conn.executemany("UPDATE professors SET name = ? WHERE prof_id = ?", prof_list)
-        print("update complete")
-
-    # DELETE
-    def del_prof(prof_id):
-        with conn:
-            conn.execute("DELETE FROM professors WHERE prof_id=?",(prof_id,))
-        print("deletion complete")
-
-    def del_profs(prof_ids):
-        # prof_ids = [1, 2, 3]
-        with conn:
-            conn.executemany(
-                "DELETE FROM professors WHERE prof_id = ?",
-                [(prof_id,) for prof_id in prof_ids]
-            )
-        print("deletion complete")
-
-class Student:
-    def __init__(self, name, age, dept_id, student_id=None):
-        self.student_id = student_id
-        self.name = name
-        self.age = age
-        self.dept_id = dept_id
-
-    # CREATE
-    @staticmethod
-    def add_student(name, age, dept_id):
-        with conn:
-            conn.execute("INSERT INTO students (name, age, dept_id) VALUES (?, ?, ?)",
-                     (name, age, dept_id))
-        print(f"Student {name} added!")
-
-    def add_students(students_list):
-        # students_list = [(name, age, dept_id)]
-        with conn:
-            conn.executemany("INSERT INTO students (name, age, dept_id) VALUES (?, ?, ?)",students_list)
-        print(f"Students: {students_list} added!")
-
-    # READ
-    def get_student(student_id):
-        try:
-            query = "SELECT * FROM students WHERE student_id = ?"
-            df = pd.read_sql_query(query, conn, params=(student_id,))
-
-            if df.empty:
-                print(f"No student found for student_id={student_id}")
-                return None
-
-            student_dict = df.to_dict(orient='records')[0]  # first row as dict
-            print(student_dict)
-            return student_dict
-
-        except Exception as e:
-            print("Database error:", e)
-            return None
-
-    def get_students(self):
-        try:
-            query = "SELECT * FROM students"
-            df = pd.read_sql_query(query, conn)
-
-            if df.empty:
-                print("No students found.")
-                return []
-
-            students = df.to_dict(orient='records')
-            print(students)
-            return students
-
-        except Exception as e:
-            print("Database error:", e)
-            return []
-
-    # UPDATE
-    def update_student(student_id, name, age):
-        with conn:
-            conn.execute("UPDATE students SET name=?, age=? WHERE student_id=?",
-                         (name, age, student_id))
-        print("update complete")
-
-    def update_students(students_list):
-        # students_list = [(new_name, students_id)]
-        with conn:
-            conn.executemany("UPDATE students SET name = ?, age=? WHERE student_id = ?", students_list)
-        print("update complete")
-
-    # DELETE
-    def del_student(student_id):
-        with conn:
-            conn.execute("DELETE FROM students WHERE student_id=?",(student_id,))
-        print("deletion complete")
-
-    def del_students(student_ids):
-        #del_students([1, 3, 5])
-        with conn:
-            conn.executemany("DELETE FROM students WHERE student_id = ?",
-                         [(student_id,) for student_id in student_ids])
-        print("deletion complete")
-
-class Course:
-    total_units = 0
-    def __init__(self, name, prof_id, dept_id, units, schedule, course_code=None):
-        self.course_code = course_code
-        self.name = name
-        self.prof_id = prof_id
-        self.dept_id = dept_id
-        self.schedule=schedule
-        self.units = units
-
-    # CREATE
-    @staticmethod
-    def add_course(name, prof_id, dept_id, units, schedule):
-        with conn: #<---for transaction rollback, omits error and auto commits on success unlike conn.commit
-            conn.execute("""INSERT INTO courses (name, prof_id, dept_id, units, schedule)
-                     VALUES (?, ?, ?, ?, ?)"""
-                    ,(name, prof_id, dept_id, units, schedule))
-        print(f"Course {name} added!")
-
-    def add_courses(courses_list):
-        # courses_list = [(name, prof_id, dept_id, units, schedule)]
-        with conn:
-            conn.executemany( """INSERT INTO courses (name, prof_id, dept_id, units, schedule)
-               VALUES (?, ?, ?, ?, ?)""", courses_list)
-        print(f"Courses: {courses_list} added!")
-
-    # READ
-    def get_course(course_code):
-        try:
-            query = "SELECT * FROM courses WHERE course_code = ?"
-            df = pd.read_sql_query(query, conn, params=(course_code,))
-
-            if df.empty:
-                print(f"No course found for course_code={course_code}")
-                return None
-
-            course_dict = df.to_dict(orient='records')[0]
-            print(course_dict)
-            return course_dict
-
-        except Exception as e:
-            print("Database error:", e)
-            return None
-
-    def get_courses(self):
-        try:
-            query = "SELECT * FROM courses"
-            df = pd.read_sql_query(query, conn)
-
-            if df.empty:
-                print("No courses found.")
-                return []
-
-            courses = df.to_dict(orient='records')
-            print(courses)
-            return courses
-
-        except Exception as e:
-            print("Database error:", e)
-            return []
-
-    # UPDATE
-    def update_course(course_code, name, units, schedule):
-        with conn:
-            conn.execute("UPDATE courses SET name=?, units=?, schedule=? WHERE course_code=?",
-                         (name, units, schedule,course_code))
-        print("update complete")
-
-    def update_courses(courses_list):
-        # courses_list = [(new_name, new_units, schedule, course_code)]
-        with conn:
-            conn.executemany("UPDATE courses SET name = ?, units = ?, schedule=? WHERE course_code = ?",
-            courses_list)
-
-    # DELETE
-    def del_course(course_code):
-        with conn:
-            conn.execute("DELETE FROM courses WHERE course_code=?",(course_code,))
-        print("deletion complete")
-
-    def del_courses(course_codes):
-        #del_courses([1, 3, 5])
-        with conn:
-            conn.executemany("DELETE FROM courses WHERE course_code = ?",
-                         [(course_code,) for course_code in course_codes])
-        print("deletion complete")
-
-class Enrollment:
-    def __init__(self, student_id, course_code, enrollment_no=None):
-        self.enrollment_no = enrollment_no
-        self.student_id = student_id
-        self.course_code = course_code
-
-    # CREATE
-    @staticmethod
-    def add_enrollment(student_id, course_code):
-        #Check total enrolled units for this student ---
-        cursor = conn.execute("""
-            SELECT IFNULL(SUM(c.units), 0)
-            FROM enrollments e
-            JOIN courses c ON e.course_code = c.course_code
-            WHERE e.student_id = ?
-        """, (student_id,))
-        current_units = cursor.fetchone()[0]
-
-        cursor = conn.execute("""
-            SELECT units FROM courses WHERE course_code = ?
-        """, (course_code,))
-        new_course_units = cursor.fetchone()[0]
-
-        if current_units + new_course_units > 18:
-            print(f"Enrollment denied: total would be {current_units + new_course_units} units (limit is 18).")
-            return
-
-        try:
-            with conn:
-                conn.execute("""
-                       INSERT INTO enrollments (student_id, course_code)
-                       VALUES (?, ?)
-                   """, (student_id, course_code))
-            print("Enrollment successful")
-        except sqlite3.IntegrityError as e:
-            print(f"Enrollment failed: {e}")
-
-    def add_enrollments(enrollments_list):
-        # Check total enrolled units for this student
-        with conn:
-            for student_id, course_code in enrollments_list:
-                # Check total enrolled units
-                cursor = conn.execute("""
-                    SELECT IFNULL(SUM(c.units), 0)
-                    FROM enrollments e
-                    JOIN courses c ON e.course_code = c.course_code
-                    WHERE e.student_id = ?
-                """, (student_id,))
-                current_units = cursor.fetchone()[0]
-
-                cursor = conn.execute("SELECT units FROM courses WHERE course_code = ?", (course_code,))
-                new_units = cursor.fetchone()[0]
-
-                if current_units + new_units > 18:
-                    print(f"Enrollment denied for student {student_id}: total would be {current_units + new_units} units.")
-                    continue  # Skip this enrollment
-
-                conn.execute("INSERT INTO enrollments (student_id, course_code) VALUES (?, ?)",
-                    (student_id, course_code))
-                print("Enrollment successful")
-
-    # READ
-    def get_enrollment(enrollment_no):
-        try:
-            query = "SELECT * FROM enrollments WHERE enrollment_no = ?"
-            df = pd.read_sql_query(query, conn, params=(enrollment_no,))
-
-            if df.empty:
-                print(f"No enrollment found for enrollment_no={enrollment_no}")
-                return None
-
-            enrollment_dict = df.to_dict(orient='records')[0]
-            print(enrollment_dict)
-            return enrollment_dict
-
-        except Exception as e:
-            print("Database error:", e)
-            return None
-
-    def get_enrollments(self):
-        try:
-            query = "SELECT * FROM enrollments"
-            df = pd.read_sql_query(query, conn)
-
-            if df.empty:
-                print("No enrollments found.")
-                return []
-
-            enrollments = df.to_dict(orient='records')
-            print(enrollments)
-            return enrollments
-
-        except Exception as e:
-            print("Database error:", e)
-            return []
-
-    # UPDATE
-    #Enrollment contains only primary keys and foreign keys, updating it directly is a bad idea
-
-    # DELETE
-    def del_enrollment(enrollment_no):
-        with conn:
-            conn.execute("DELETE FROM enrollments WHERE enrollment_number=?",(enrollment_no,))
-        print("deletion complete")
-
-    def del_enrollments(enrollment_nos):
-        #del_enrollments([1, 3, 5])
-        with conn:
-            conn.executemany("DELETE FROM enrollments WHERE enrollment_no = ?",
-                         [(enrollment_no,) for enrollment_no in enrollment_nos])
-        print("deletion complete")
-
-#REPORTS & ANALYTICS
-
-def course_roster():
-    """ Course roster with professor name and enrolled student list"""
-    query = """
-    SELECT 
-        c.course_code,
-        c.name AS course_name,
-        p.name AS professor_name,
-        s.name AS student_name
-    FROM courses c
-    JOIN professors p ON c.prof_id = p.prof_id
-    LEFT JOIN enrollments e ON c.course_code = e.course_code
-    LEFT JOIN students s ON e.student_id = s.student_id
-    ORDER BY c.course_code, s.name;
-    """
-    df = pd.read_sql_query(query, conn)
-    print("COURSE ROSTER")
-    if df.empty:
-        print("No enrollments found.")
-    else:
-        print(df)
-    return df
-
-def student_timetable(student_id):
-    """Individual student’s timetable"""
-    query = """
-    SELECT 
-        s.name AS student_name,
-        c.name AS course_name,
-        c.units,
-        c.schedule,  -- 🆕 show the schedule
-        p.name AS professor_name,
-        d.name AS department_name
-    FROM enrollments e
-    JOIN students s ON e.student_id = s.student_id
-    JOIN courses c ON e.course_code = c.course_code
-    JOIN professors p ON c.prof_id = p.prof_id
-    JOIN departments d ON c.dept_id = d.dept_id
-    WHERE s.student_id = ?
-    """
-    df = pd.read_sql_query(query, conn, params=(student_id,))
-    print(f"TIMETABLE FOR STUDENT {student_id}")
-    if df.empty:
-        print("No courses enrolled.")
-    else:
-        print(df)
-        print(f"Total Units: {df['units'].sum()}")
-    return df
-
-def department_summary():
-    """Department-level summary (#courses, #students, average section size)"""
-    query = """
-    SELECT 
-        d.name AS department,
-        COUNT(DISTINCT c.course_code) AS num_courses,
-        COUNT(DISTINCT s.student_id) AS num_students,
-        ROUND(AVG(enrollment_count), 2) AS avg_section_size
-    FROM departments d
-    LEFT JOIN courses c ON d.dept_id = c.dept_id
-    LEFT JOIN professors p ON c.prof_id = p.prof_id
-    LEFT JOIN enrollments e ON c.course_code = e.course_code
-    LEFT JOIN students s ON e.student_id = s.student_id
-    LEFT JOIN (
-        SELECT course_code, COUNT(*) AS enrollment_count
-        FROM enrollments
-        GROUP BY course_code
-    ) ec ON c.course_code = ec.course_code
-    GROUP BY d.name;
-    """
-    df = pd.read_sql_query(query, conn)
-    print("DEPARTMENT SUMMARY")
-    if df.empty:
-        print("No data found.")
-    else:
-        print(df)
-    return df
-
-def plot_enrollment_by_department():
-    """Optional pandas visualization: total enrollments per department"""
-    query = """
-    SELECT 
-        d.name AS department,
-        COUNT(e.enrollment_no) AS total_enrollments
-    FROM departments d
-    LEFT JOIN courses c ON d.dept_id = c.dept_id
-    LEFT JOIN enrollments e ON c.course_code = e.course_code
-    GROUP BY d.name;
-    """
-    df = pd.read_sql_query(query, conn)
-    df.plot(kind='bar', x='department', y='total_enrollments', title='Enrollments per Department')
-    plt.show()
-    return df
-
-
-def analyze_enrollment_by_department():
-    """Exports enrollments per department into a DataFrame and visualizes results."""
-
-    # --- Step 1: Query the database into a pandas DataFrame ---
-    query = """
-    SELECT 
-        d.name AS department,
-        COUNT(e.enrollment_no) AS total_enrollments
-    FROM departments d
-    LEFT JOIN courses c ON d.dept_id = c.dept_id
-    LEFT JOIN enrollments e ON c.course_code = e.course_code
-    GROUP BY d.name
-    ORDER BY total_enrollments DESC;
-    """
-
-    df = pd.read_sql_query(query, conn)
-
-    # --- Step 2: Display DataFrame content ---
-    print("ENROLLMENTS PER DEPARTMENT")
-    print(df)
-
-    # --- Step 3: Simple descriptive analysis ---
-    total = df["total_enrollments"].sum()
-    avg = df["total_enrollments"].mean()
-    most = df.loc[df["total_enrollments"].idxmax(), "department"] if not df.empty else None
-
-    print("ANALYSIS SUMMARY")
-    print(f"Total Enrollments: {total}")
-    print(f"Average Enrollments per Department: {avg:.2f}")
-    print(f"Department with Most Enrollments: {most}")
-
-    # --- Step 4: Visualization ---
-    df.plot(kind='bar', x='department', y='total_enrollments',
-            title='Enrollments per Department', legend=False, figsize=(7, 4))
-    plt.show()
-    return df
-
-#TESTING
-
-Student.del_student(8)
-#readding student chnages in number due to autoincrement
-Student.add_student("Heidi Clark", 19, 2)
-
-Student.get_students(0)
\ No newline at end of file
+import logging
+import re
+import reprlib
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from sys import excepthook
+# pandas and matplotlib are imported inside the report/plot functions, they
+# cost about a second at import and most callers only need the CRUD classes
+# (numpy and asyncio likewise, only the snapshot and AsyncEnrollment need them)
+
+logger = logging.getLogger("enrollment")
+
+# --- CONNECTIONS ---
+
+class ConnectionManager:
+    """Opens one tuned sqlite3 connection per thread, lazily, for a database path"""
+    def __init__(self, path="enrollment.db", cache_size=-64000, mmap_size=256 * 1024 * 1024,
+                 busy_timeout=5000, cached_statements=256):
+        self.path = path
+        self.cache_size = cache_size  # negative = KiB, so -64000 is ~64MB of page cache
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout  # ms to wait on a lock before "database is locked"
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # connection -> the thread it belongs to
+
+    def connect(self):
+        # the calling thread's connection, opened on first use
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.close_stale()  # a new thread is a good moment to reap the ones gone
+            # each connection only ever runs on its own thread; check_same_thread is
+            # off so close_all() can close them from whichever thread shuts down
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000,
+                                         cached_statements=self.cached_statements,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+            connection.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, no fsync per commit
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            if _instrumentation["enabled"] and _instrumentation["trace_sql"]:
+                connection.set_trace_callback(_trace_sql)
+            self._local.connection = connection
+            self._local.cursors = {}
+            with self._lock:
+                self._connections[connection] = threading.current_thread()
+        return connection
+
+    def close(self):
+        # closes the calling thread's connection
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self._local.connection = None
+            self._local.cursors = {}
+            with self._lock:
+                self._connections.pop(connection, None)
+            connection.close()
+
+    def close_stale(self):
+        """Closes the connections of threads that have exited, returns how many"""
+        # a finished thread can't close its own connection any more (pool workers
+        # rarely get the chance), so they would otherwise stay open until close_all()
+        with self._lock:
+            stale = [connection for connection, thread in self._connections.items() if not thread.is_alive()]
+            for connection in stale:
+                del self._connections[connection]
+        for connection in stale:
+            connection.close()
+        return len(stale)
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = list(self._connections), {}
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+        # the cached rows, charts and snapshots came from this database; open_db() may be switching
+        for cache in CACHES.values():
+            cache.clear()
+        _snapshots.clear()
+
+    # lets the manager stand in for a connection: conn.execute(...), with conn: ...
+    def execute(self, *args):
+        return self.connect().execute(*args)
+
+    def executemany(self, *args):
+        return self.connect().executemany(*args)
+
+    def cursor(self):
+        return self.connect().cursor()
+
+    def run(self, name, params=(), many=False):
+        """Runs the QUERIES statement name on a cursor this thread keeps open for it"""
+        # The statement is prepared once and then reused from sqlite3's statement
+        # cache (cached_statements entries); the cursor is reused as well. Read a
+        # SELECT to the end (fetchall) before running name again: a half-read
+        # cursor keeps its statement active and pins the connection's read snapshot.
+        connection = self.connect()
+        cursor = self._local.cursors.get(name)
+        if cursor is None:
+            cursor = self._local.cursors[name] = connection.cursor()
+        if many:
+            return cursor.executemany(QUERIES[name], params)
+        return cursor.execute(QUERIES[name], params)
+
+    def commit(self):
+        self.connect().commit()
+
+    def rollback(self):
+        self.connect().rollback()
+
+    # inside a Session "with conn:" is a savepoint, so the CRUD methods nest in its transaction
+    def __enter__(self):
+        if getattr(self._local, "session", None) is not None:
+            self._enter_savepoint()
+            return self.connect()
+        return self.connect().__enter__()
+
+    def __exit__(self, *exc_info):
+        if getattr(self._local, "session", None) is not None:
+            self._exit_savepoint(exc_info[0] is not None)
+            return False
+        return self.connect().__exit__(*exc_info)
+
+    def _enter_savepoint(self):
+        depth = getattr(self._local, "savepoints", 0) + 1
+        self._local.savepoints = depth
+        self.connect().execute(f"SAVEPOINT sp_{depth}")
+        return depth
+
+    def _exit_savepoint(self, failed):
+        depth = self._local.savepoints
+        self._local.savepoints = depth - 1
+        connection = self.connect()
+        if failed:
+            connection.execute(f"ROLLBACK TO sp_{depth}")
+        connection.execute(f"RELEASE sp_{depth}")
+
+    @contextmanager
+    def savepoint(self):
+        """Nested transaction: an exception rolls back to here and propagates"""
+        self._enter_savepoint()
+        try:
+            yield self.connect()
+        except BaseException:
+            self._exit_savepoint(True)
+            raise
+        self._exit_savepoint(False)
+
+    @contextmanager
+    def immediate(self):
+        # like "with conn:" but starts with BEGIN IMMEDIATE, taking the write lock up
+        # front so what the block reads can't change before it writes
+        connection = self.connect()
+        if connection.in_transaction:  # already inside the caller's transaction
+            with self.savepoint():
+                yield connection
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+conn = ConnectionManager("enrollment.db")  # nothing is opened until first use
+
+def open_db(path="enrollment.db", **options):
+    """Points the module at a database and creates its schema, returns the manager"""
+    # options are passed to ConnectionManager (cache_size, busy_timeout, cached_statements, ...);
+    # keep cached_statements above len(QUERIES) so the registry never falls out of the cache
+    global conn
+    conn.close_all()  # also drops everything cached from the old database
+    conn = ConnectionManager(path, **options)
+    init_schema()
+    return conn
+
+MAX_UNITS = 18  # per-student unit cap enforced on enrollment
+
+# --- QUERIES ---
+
+# Every CRUD statement, by name, with named parameters; run them with conn.run(name, {...}).
+# The report statements are added under their report's name further down.
+QUERIES = {
+    # departments
+    "get_dept": "SELECT * FROM departments WHERE dept_id = :dept_id",
+    "add_dept": "INSERT INTO departments (name) VALUES (:name)",
+    "update_dept": "UPDATE departments SET name = :name WHERE dept_id = :dept_id",
+
+    # professors
+    "get_prof": "SELECT * FROM professors WHERE prof_id = :prof_id",
+    "add_prof": "INSERT INTO professors (name, dept_id) VALUES (:name, :dept_id)",
+    "update_prof": "UPDATE professors SET name = :name WHERE prof_id = :prof_id",
+
+    # students
+    "get_student": "SELECT * FROM students WHERE student_id = :student_id",
+    "add_student": "INSERT INTO students (name, age, dept_id) VALUES (:name, :age, :dept_id)",
+    "update_student": "UPDATE students SET name = :name, age = :age WHERE student_id = :student_id",
+
+    # courses
+    "get_course": "SELECT * FROM courses WHERE course_code = :course_code",
+    "add_course": """INSERT INTO courses (name, prof_id, dept_id, units, schedule, capacity)
+                     VALUES (:name, :prof_id, :dept_id, :units, :schedule, :capacity)""",
+    "last_course_code": "SELECT IFNULL(MAX(course_code), 0) FROM courses",
+    "course_schedules_after": "SELECT course_code, schedule FROM courses WHERE course_code > :course_code",
+    "course_schedules_in": """SELECT course_code, schedule FROM courses
+                              WHERE course_code IN (SELECT value FROM json_each(:course_codes))""",
+    "update_course": """UPDATE courses SET name = :name, units = :units, schedule = :schedule
+                        WHERE course_code = :course_code""",
+    "set_capacity": "UPDATE courses SET capacity = :capacity WHERE course_code = :course_code",
+    "del_course_slots": "DELETE FROM course_slots WHERE course_code = :course_code",
+    "add_course_slot": """INSERT OR IGNORE INTO course_slots (course_code, day, start_min, end_min)
+                          VALUES (:course_code, :day, :start_min, :end_min)""",
+
+    # enrollments
+    "get_enrollment": "SELECT * FROM enrollments WHERE enrollment_no = :enrollment_no",
+    "student_units": "SELECT units FROM student_load WHERE student_id = :student_id",
+    "section_size": "SELECT section_size FROM course_stats WHERE course_code = :course_code",
+    "is_enrolled": "SELECT 1 FROM enrollments WHERE student_id = :student_id AND course_code = :course_code",
+    "add_enrollment": "INSERT INTO enrollments (student_id, course_code) VALUES (:student_id, :course_code)",
+    "del_enrollment": "DELETE FROM enrollments WHERE enrollment_no = :enrollment_no",
+
+    # batch enrollment, staged in temp.enroll_batch
+    "create_enroll_batch": """
+        CREATE TEMP TABLE IF NOT EXISTS enroll_batch (
+        seq INTEGER PRIMARY KEY,
+        student_id INTEGER NOT NULL,
+        course_code INTEGER NOT NULL)""",
+    "clear_enroll_batch": "DELETE FROM temp.enroll_batch",
+    "stage_enroll_batch": """INSERT INTO temp.enroll_batch (seq, student_id, course_code)
+                             VALUES (:seq, :student_id, :course_code)""",
+    "batch_students": """
+        SELECT student_id FROM students
+        WHERE student_id IN (SELECT student_id FROM temp.enroll_batch)""",
+    "batch_student_units": """
+        SELECT student_id, units FROM student_load
+        WHERE student_id IN (SELECT student_id FROM temp.enroll_batch)""",
+    "batch_courses": """
+        SELECT c.course_code, c.units, c.capacity, IFNULL(cs.section_size, 0)
+        FROM courses c
+        LEFT JOIN course_stats cs ON cs.course_code = c.course_code
+        WHERE c.course_code IN (SELECT course_code FROM temp.enroll_batch)""",
+    "batch_enrolled": """
+        SELECT e.student_id, e.course_code
+        FROM temp.enroll_batch b
+        JOIN enrollments e ON e.student_id = b.student_id AND e.course_code = b.course_code""",
+
+    # waitlist
+    "add_waitlist": "INSERT INTO waitlist (student_id, course_code) VALUES (:student_id, :course_code)",
+    "waitlist_position": """
+        SELECT COUNT(*) FROM waitlist WHERE course_code = :course_code
+        AND waitlist_no <= (SELECT waitlist_no FROM waitlist
+                            WHERE student_id = :student_id AND course_code = :course_code)""",
+    "leave_waitlist": "DELETE FROM waitlist WHERE student_id = :student_id AND course_code = :course_code",
+    "get_waitlist": """SELECT student_id, waitlist_no FROM waitlist
+                       WHERE course_code = :course_code ORDER BY waitlist_no""",
+
+    # data version, for the chart cache
+    "data_version": "SELECT version FROM data_version",
+    "bump_data_version": "UPDATE data_version SET version = version + 1",
+
+    # change log
+    "changes_since": """
+        SELECT seq, table_name, op, row_id, data, changed_at FROM change_log
+        WHERE seq > :seq AND (:tables IS NULL OR table_name IN (SELECT value FROM json_each(:tables)))
+        ORDER BY seq LIMIT :limit""",
+    "last_change_seq": """SELECT MAX(IFNULL((SELECT MAX(seq) FROM change_log), 0), purged_seq)
+                          FROM change_log_state""",
+    "change_log_purged": "SELECT purged_seq FROM change_log_state",
+    "collapse_change_log": """
+        DELETE FROM change_log
+        WHERE seq <= :seq AND seq NOT IN (SELECT MAX(seq) FROM change_log WHERE seq <= :seq
+                                          GROUP BY table_name, row_id)""",
+    "purge_change_log": "DELETE FROM change_log WHERE seq <= :seq",
+    "set_change_log_purged": "UPDATE change_log_state SET purged_seq = MAX(purged_seq, :seq)",
+
+    # set-based deletes (see DELETE_CASCADES), the ids staged in temp.delete_ids
+    "create_delete_ids": "CREATE TEMP TABLE IF NOT EXISTS delete_ids (id INTEGER PRIMARY KEY)",
+    "clear_delete_ids": "DELETE FROM temp.delete_ids",
+    "stage_delete_ids": "INSERT OR IGNORE INTO temp.delete_ids (id) VALUES (:id)",
+    "delete_students.waitlist": "DELETE FROM waitlist WHERE student_id IN (SELECT id FROM temp.delete_ids)",
+    "delete_students.enrollments": "DELETE FROM enrollments WHERE student_id IN (SELECT id FROM temp.delete_ids)",
+    "delete_students.students": "DELETE FROM students WHERE student_id IN (SELECT id FROM temp.delete_ids)",
+    "delete_courses.waitlist": "DELETE FROM waitlist WHERE course_code IN (SELECT id FROM temp.delete_ids)",
+    "delete_courses.enrollments": "DELETE FROM enrollments WHERE course_code IN (SELECT id FROM temp.delete_ids)",
+    "delete_courses.courses": "DELETE FROM courses WHERE course_code IN (SELECT id FROM temp.delete_ids)",
+    "delete_professors.courses.prof_id": """UPDATE courses SET prof_id = NULL
+                                            WHERE prof_id IN (SELECT id FROM temp.delete_ids)""",
+    "delete_professors.professors": "DELETE FROM professors WHERE prof_id IN (SELECT id FROM temp.delete_ids)",
+    "restrict_departments.professors": """SELECT COUNT(*) FROM professors
+                                          WHERE dept_id IN (SELECT id FROM temp.delete_ids)""",
+    "delete_departments.courses.dept_id": """UPDATE courses SET dept_id = NULL
+                                             WHERE dept_id IN (SELECT id FROM temp.delete_ids)""",
+    "delete_departments.students.dept_id": """UPDATE students SET dept_id = NULL
+                                              WHERE dept_id IN (SELECT id FROM temp.delete_ids)""",
+    "delete_departments.departments": "DELETE FROM departments WHERE dept_id IN (SELECT id FROM temp.delete_ids)",
+}
+
+# --- INSTRUMENTATION ---
+
+# Off by default. When enabled, every CRUD and report call (see the bottom of the
+# module) records its wall time, rows returned and the SQL it ran; calls slower
+# than slow_ms go to the "enrollment.slow" logger, every call to "enrollment.ops"
+# at DEBUG and every statement to "enrollment.sql" at DEBUG.
+_instrumentation = {"enabled": False, "slow_ms": 100.0, "window": 1000, "trace_sql": True}
+_op_stats = {}  # operation name -> OpStats
+_stats_lock = threading.Lock()
+_traced = threading.local()  # stack of SQL lists, one per instrumented call in progress
+ops_logger = logging.getLogger("enrollment.ops")
+slow_logger = logging.getLogger("enrollment.slow")
+sql_logger = logging.getLogger("enrollment.sql")
+
+class OpStats:
+    """Counters plus a rolling window of latencies for one operation"""
+    def __init__(self, window=1000):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, elapsed, rows, failed):
+        self.calls += 1
+        self.errors += failed
+        self.rows += rows or 0
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.latencies.append(elapsed)
+
+    def percentile(self, q):
+        # nearest rank over the window
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def summary(self):
+        return {"calls": self.calls, "errors": self.errors, "rows": self.rows,
+                "total_ms": self.total * 1000, "mean_ms": self.total / self.calls * 1000 if self.calls else 0.0,
+                "p50_ms": self.percentile(50) * 1000, "p95_ms": self.percentile(95) * 1000,
+                "p99_ms": self.percentile(99) * 1000, "max_ms": self.max * 1000}
+
+def _trace_sql(statement):
+    stack = getattr(_traced, "stack", None)
+    if stack:
+        stack[-1].append(statement)
+    sql_logger.debug("%s", statement)
+
+def _count_rows(result):
+    # rows a call returned: list/DataFrame length, 1 for a single row, 0 for nothing
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return 1
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+def instrumented(name):
+    """Decorator that records a call under name while instrumentation is enabled"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _instrumentation["enabled"]:
+                return fn(*args, **kwargs)
+
+            stack = getattr(_traced, "stack", None)
+            if stack is None:
+                stack = _traced.stack = []
+            statements = []
+            stack.append(statements)
+            failed, result = True, None
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                if stack:  # nested call, the caller ran these statements too
+                    stack[-1].extend(statements)
+                rows = _count_rows(result)
+                with _stats_lock:
+                    stats = _op_stats.get(name)
+                    if stats is None:
+                        stats = _op_stats[name] = OpStats(_instrumentation["window"])
+                    stats.record(elapsed, rows, failed)
+                ops_logger.debug("%s %.2f ms rows=%s%s", name, elapsed * 1000, rows, " FAILED" if failed else "")
+                if elapsed * 1000 >= _instrumentation["slow_ms"]:
+                    slow_logger.warning("slow %s: %.1f ms, rows=%s, args=%s\n%s", name, elapsed * 1000, rows,
+                                        reprlib.repr(args), "\n".join(statements) or "(no SQL traced)")
+        return wrapper
+    return decorate
+
+def enable_instrumentation(slow_ms=None, window=None, trace_sql=None):
+    """Starts recording call timings; slow_ms sets the slow-log threshold"""
+    for key, value in (("slow_ms", slow_ms), ("window", window), ("trace_sql", trace_sql)):
+        if value is not None:
+            _instrumentation[key] = value
+    _instrumentation["enabled"] = True
+    callback = _trace_sql if _instrumentation["trace_sql"] else None
+    with conn._lock:
+        for connection in conn._connections:
+            connection.set_trace_callback(callback)
+
+def disable_instrumentation():
+    _instrumentation["enabled"] = False
+    with conn._lock:
+        for connection in conn._connections:
+            connection.set_trace_callback(None)
+
+def instrumentation_stats(reset=False):
+    """{operation: calls, errors, rows, total/mean/p50/p95/p99/max ms}, slowest total first"""
+    with _stats_lock:
+        stats = {name: op.summary() for name, op in _op_stats.items()}
+        if reset:
+            _op_stats.clear()
+    return dict(sorted(stats.items(), key=lambda item: -item[1]["total_ms"]))
+
+def log_instrumentation_stats(level=logging.INFO):
+    """Writes instrumentation_stats() to the "enrollment.ops" logger as a table"""
+    stats = instrumentation_stats()
+    lines = [f"{'operation':<40} {'calls':>7} {'errors':>6} {'rows':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+    lines += [f"{name:<40} {s['calls']:>7} {s['errors']:>6} {s['rows']:>9} "
+              f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}" for name, s in stats.items()]
+    ops_logger.log(level, "\n".join(lines))
+    return stats
+
+# --- TABLE CREATION ---
+
+def init_schema():
+    """Creates the tables, maintenance triggers and indexes if they don't exist yet"""
+    # 1️⃣ Department Table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS departments (
+    dept_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE)""")
+
+    # 2️⃣ Professor Table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS professors (
+    prof_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    dept_id INTEGER NOT NULL,
+    FOREIGN KEY(dept_id) REFERENCES departments(dept_id))""")
+
+    # 3️⃣ Student Table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS students (
+    student_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    dept_id INTEGER,
+    FOREIGN KEY(dept_id) REFERENCES departments(dept_id))""")
+
+    # 4️⃣ Course Table #course id/code
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS courses (
+    course_code INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    prof_id INTEGER,
+    dept_id INTEGER,
+    units INTEGER NOT NULL DEFAULT 3,
+    schedule text,
+    capacity INTEGER,  -- seats, NULL means no limit
+    FOREIGN KEY(prof_id) REFERENCES professors(prof_id),
+    FOREIGN KEY(dept_id) REFERENCES departments(dept_id))""")
+    if "capacity" not in table_columns("courses"):  # databases created before capacities
+        conn.execute("ALTER TABLE courses ADD COLUMN capacity INTEGER")
+
+    # 5️⃣ Enrollment Table #enrollment id/no
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS enrollments (
+    enrollment_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    course_code INTEGER NOT NULL,
+    UNIQUE(student_id, course_code),
+    FOREIGN KEY(student_id) REFERENCES students(student_id),
+    FOREIGN KEY(course_code) REFERENCES courses(course_code))""")
+
+    # 6️⃣ Student Load Table #running total of enrolled units per student
+    load_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_load'").fetchone()
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS student_load (
+    student_id INTEGER PRIMARY KEY,
+    units INTEGER NOT NULL DEFAULT 0)""")
+
+    # triggers keep student_load in step with enrollments and course units
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS student_load_enroll AFTER INSERT ON enrollments
+    BEGIN
+        INSERT INTO student_load (student_id, units)
+        VALUES (NEW.student_id, IFNULL((SELECT units FROM courses WHERE course_code = NEW.course_code), 0))
+        ON CONFLICT(student_id) DO UPDATE SET units = units + excluded.units;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS student_load_drop AFTER DELETE ON enrollments
+    BEGIN
+        UPDATE student_load
+        SET units = units - IFNULL((SELECT units FROM courses WHERE course_code = OLD.course_code), 0)
+        WHERE student_id = OLD.student_id;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS student_load_units AFTER UPDATE OF units ON courses
+    BEGIN
+        UPDATE student_load SET units = units + NEW.units - OLD.units
+        WHERE student_id IN (SELECT student_id FROM enrollments WHERE course_code = NEW.course_code);
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS student_load_course_del AFTER DELETE ON courses
+    BEGIN
+        UPDATE student_load SET units = units - OLD.units
+        WHERE student_id IN (SELECT student_id FROM enrollments WHERE course_code = OLD.course_code);
+    END""")
+
+    # 7️⃣ Indexes for the join and filter paths used by the reports
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_enrollments_course ON enrollments(course_code, student_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_courses_dept ON courses(dept_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_courses_prof ON courses(prof_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_professors_dept ON professors(dept_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_dept ON students(dept_id)")
+    # enrollments(student_id) is already covered by the UNIQUE(student_id, course_code) index
+
+    # 8️⃣ Department Stats #materialized department_summary, kept current by triggers
+    stats_exist = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dept_stats'").fetchone()
+    # enrolled/enrolled_sq are the sum of section sizes and of their squares, the
+    # average section size is enrolled_sq / enrolled (weighted per enrolled student,
+    # the same figure the old AVG over the enrollment join produced)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dept_stats (
+    dept_id INTEGER PRIMARY KEY,
+    num_courses INTEGER NOT NULL DEFAULT 0,
+    num_students INTEGER NOT NULL DEFAULT 0,
+    enrolled INTEGER NOT NULL DEFAULT 0,
+    enrolled_sq INTEGER NOT NULL DEFAULT 0)""")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS course_stats (
+    course_code INTEGER PRIMARY KEY,
+    dept_id INTEGER,
+    section_size INTEGER NOT NULL DEFAULT 0)""")
+
+    # one row per (department, student) with the number of that department's courses taken
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dept_students (
+    dept_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    courses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(dept_id, student_id)) WITHOUT ROWID""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_students_add AFTER INSERT ON dept_students
+    BEGIN
+        INSERT INTO dept_stats (dept_id, num_students) VALUES (NEW.dept_id, 1)
+        ON CONFLICT(dept_id) DO UPDATE SET num_students = num_students + 1;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_students_remove AFTER DELETE ON dept_students
+    BEGIN
+        UPDATE dept_stats SET num_students = num_students - 1 WHERE dept_id = OLD.dept_id;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_stats_enroll AFTER INSERT ON enrollments
+    BEGIN
+        UPDATE course_stats SET section_size = section_size + 1 WHERE course_code = NEW.course_code;
+        UPDATE dept_stats
+        SET enrolled = enrolled + 1,
+            enrolled_sq = enrolled_sq + 2 * (SELECT section_size FROM course_stats WHERE course_code = NEW.course_code) - 1
+        WHERE dept_id = (SELECT dept_id FROM course_stats WHERE course_code = NEW.course_code);
+        INSERT INTO dept_students (dept_id, student_id, courses)
+        SELECT dept_id, NEW.student_id, 1 FROM course_stats
+        WHERE course_code = NEW.course_code AND dept_id IS NOT NULL
+        ON CONFLICT(dept_id, student_id) DO UPDATE SET courses = courses + 1;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_stats_drop AFTER DELETE ON enrollments
+    BEGIN
+        UPDATE dept_stats
+        SET enrolled = enrolled - 1,
+            enrolled_sq = enrolled_sq - 2 * (SELECT section_size FROM course_stats WHERE course_code = OLD.course_code) + 1
+        WHERE dept_id = (SELECT dept_id FROM course_stats WHERE course_code = OLD.course_code);
+        UPDATE course_stats SET section_size = section_size - 1 WHERE course_code = OLD.course_code;
+        UPDATE dept_students SET courses = courses - 1
+        WHERE student_id = OLD.student_id
+        AND dept_id = (SELECT dept_id FROM course_stats WHERE course_code = OLD.course_code);
+        DELETE FROM dept_students
+        WHERE student_id = OLD.student_id AND courses <= 0
+        AND dept_id = (SELECT dept_id FROM course_stats WHERE course_code = OLD.course_code);
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_stats_course_add AFTER INSERT ON courses
+    BEGIN
+        INSERT INTO course_stats (course_code, dept_id) VALUES (NEW.course_code, NEW.dept_id);
+        INSERT INTO dept_stats (dept_id, num_courses) SELECT NEW.dept_id, 1 WHERE NEW.dept_id IS NOT NULL
+        ON CONFLICT(dept_id) DO UPDATE SET num_courses = num_courses + 1;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_stats_course_del AFTER DELETE ON courses
+    BEGIN
+        UPDATE dept_stats
+        SET num_courses = num_courses - 1,
+            enrolled = enrolled - (SELECT section_size FROM course_stats WHERE course_code = OLD.course_code),
+            enrolled_sq = enrolled_sq - (SELECT section_size * section_size FROM course_stats
+                                         WHERE course_code = OLD.course_code)
+        WHERE dept_id = OLD.dept_id;
+        UPDATE dept_students SET courses = courses - 1
+        WHERE dept_id = OLD.dept_id
+        AND student_id IN (SELECT student_id FROM enrollments WHERE course_code = OLD.course_code);
+        DELETE FROM dept_students WHERE dept_id = OLD.dept_id AND courses <= 0;
+        DELETE FROM course_stats WHERE course_code = OLD.course_code;
+    END""")
+
+    # a course changing department moves its courses/students/section counts across
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS dept_stats_course_move AFTER UPDATE OF dept_id ON courses
+    WHEN OLD.dept_id IS NOT NEW.dept_id
+    BEGIN
+        UPDATE dept_stats
+        SET num_courses = num_courses - 1,
+            enrolled = enrolled - (SELECT section_size FROM course_stats WHERE course_code = OLD.course_code),
+            enrolled_sq = enrolled_sq - (SELECT section_size * section_size FROM course_stats
+                                         WHERE course_code = OLD.course_code)
+        WHERE dept_id = OLD.dept_id;
+        INSERT INTO dept_stats (dept_id, num_courses, enrolled, enrolled_sq)
+        SELECT NEW.dept_id, 1, section_size, section_size * section_size
+        FROM course_stats WHERE course_code = OLD.course_code AND NEW.dept_id IS NOT NULL
+        ON CONFLICT(dept_id) DO UPDATE SET num_courses = num_courses + 1,
+            enrolled = enrolled + excluded.enrolled,
+            enrolled_sq = enrolled_sq + excluded.enrolled_sq;
+        UPDATE dept_students SET courses = courses - 1
+        WHERE dept_id = OLD.dept_id
+        AND student_id IN (SELECT student_id FROM enrollments WHERE course_code = OLD.course_code);
+        DELETE FROM dept_students WHERE dept_id = OLD.dept_id AND courses <= 0;
+        INSERT INTO dept_students (dept_id, student_id, courses)
+        SELECT NEW.dept_id, student_id, 1 FROM enrollments
+        WHERE course_code = NEW.course_code AND NEW.dept_id IS NOT NULL
+        ON CONFLICT(dept_id, student_id) DO UPDATE SET courses = courses + 1;
+        UPDATE course_stats SET dept_id = NEW.dept_id WHERE course_code = OLD.course_code;
+    END""")
+
+    # 9️⃣ Course Slots Table #parsed courses.schedule, one row per (day, start, end)
+    slots_exist = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_slots'").fetchone()
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS course_slots (
+    course_code INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    start_min INTEGER NOT NULL,
+    end_min INTEGER NOT NULL,
+    PRIMARY KEY(course_code, day, start_min, end_min))""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS course_slots_course_del AFTER DELETE ON courses
+    BEGIN
+        DELETE FROM course_slots WHERE course_code = OLD.course_code;
+    END""")
+
+    # 🔟 Waitlist Table #FIFO queue per full course, promoted when a seat frees up
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS waitlist (
+    waitlist_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    course_code INTEGER NOT NULL,
+    UNIQUE(student_id, course_code),
+    FOREIGN KEY(student_id) REFERENCES students(student_id),
+    FOREIGN KEY(course_code) REFERENCES courses(course_code))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_course ON waitlist(course_code, waitlist_no)")
+
+    # Promotion enrolls the oldest waitlisted students that still fit under the unit
+    # cap; it runs inside the statement that freed the seat, so in its transaction.
+    # Seats are counted from enrollments itself, course_stats may not be updated yet.
+    promote = f"""
+        INSERT INTO enrollments (student_id, course_code)
+        SELECT w.student_id, w.course_code
+        FROM waitlist w
+        JOIN courses c ON c.course_code = w.course_code
+        LEFT JOIN student_load l ON l.student_id = w.student_id
+        WHERE w.course_code = {{course}} AND IFNULL(l.units, 0) + c.units <= {MAX_UNITS}
+        AND NOT EXISTS (SELECT 1 FROM enrollments e WHERE e.student_id = w.student_id
+                        AND e.course_code = w.course_code)
+        ORDER BY w.waitlist_no
+        LIMIT IFNULL((SELECT CASE WHEN c.capacity IS NULL THEN -1
+                                  ELSE MAX(0, c.capacity - (SELECT COUNT(*) FROM enrollments e
+                                                            WHERE e.course_code = c.course_code)) END
+                      FROM courses c WHERE c.course_code = {{course}}), 0);"""
+
+    # the seat count is NULL for a course that no longer exists (a LIMIT NULL error);
+    # databases with the triggers from before the IFNULL get them recreated
+    old_promote = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'waitlist_promote'").fetchone()
+    if old_promote and "LIMIT IFNULL(" not in old_promote[0]:
+        conn.execute("DROP TRIGGER waitlist_promote")
+        conn.execute("DROP TRIGGER IF EXISTS waitlist_capacity")
+
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS waitlist_promote AFTER DELETE ON enrollments
+    BEGIN
+        {promote.format(course="OLD.course_code")}
+    END""")
+
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS waitlist_capacity AFTER UPDATE OF capacity ON courses
+    WHEN NEW.capacity IS NULL OR NEW.capacity > IFNULL(OLD.capacity, 0)
+    BEGIN
+        {promote.format(course="NEW.course_code")}
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS waitlist_enrolled AFTER INSERT ON enrollments
+    BEGIN
+        DELETE FROM waitlist WHERE student_id = NEW.student_id AND course_code = NEW.course_code;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS waitlist_course_del AFTER DELETE ON courses
+    BEGIN
+        DELETE FROM waitlist WHERE course_code = OLD.course_code;
+    END""")
+
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS waitlist_student_del AFTER DELETE ON students
+    BEGIN
+        DELETE FROM waitlist WHERE student_id = OLD.student_id;
+    END""")
+
+    # 1️⃣1️⃣ Data Version #counter bumped by every change the enrollment charts depend on
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL)""")
+    conn.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    for name, event in (("enroll", "INSERT ON enrollments"), ("drop", "DELETE ON enrollments"),
+                        ("course_add", "INSERT ON courses"), ("course_del", "DELETE ON courses"),
+                        ("course_move", "UPDATE OF dept_id ON courses"), ("dept_add", "INSERT ON departments"),
+                        ("dept_del", "DELETE ON departments"), ("dept_rename", "UPDATE OF name ON departments")):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS data_version_{name} AFTER {event}
+        BEGIN
+            UPDATE data_version SET version = version + 1;
+        END""")
+
+    # 1️⃣2️⃣ Change Log #append-only row changes of the five tables, for incremental sync (changes_since)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- never reused, so consumers can resume after any seq
+    table_name TEXT NOT NULL,
+    op TEXT NOT NULL,  -- insert / update / delete
+    row_id INTEGER NOT NULL,
+    data TEXT,  -- the row as JSON, after the change (before it for a delete)
+    changed_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0))""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS change_log_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    purged_seq INTEGER NOT NULL)  -- entries up to here were purged by compact_change_log""")
+    conn.execute("INSERT OR IGNORE INTO change_log_state (id, purged_seq) VALUES (1, 0)")
+    for table, key in PRIMARY_KEYS.items():
+        for op, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+            data = ", ".join(f"'{column}', {row}.{column}" for column in table_columns(table))
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS change_log_{table}_{op} AFTER {op.upper()} ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, op, row_id, data)
+                VALUES ('{table}', '{op}', {row}.{key}, json_object({data}));
+            END""")
+
+    conn.commit()
+
+    if not load_exists:
+        check_student_load()  # backfill the ledger for databases created before it existed
+    if not stats_exist:
+        refresh_dept_stats()  # same for the department stats
+    if not slots_exist:
+        sync_course_slots()  # and the parsed schedules
+
+# --- UNIT LEDGER ---
+
+def check_student_load():
+    """Rebuilds the student_load ledger from enrollments and reports any drift"""
+    with conn:
+        cursor = conn.execute("""
+            WITH actual AS (
+                SELECT e.student_id, SUM(c.units) AS units
+                FROM enrollments e
+                JOIN courses c ON e.course_code = c.course_code
+                GROUP BY e.student_id)
+            SELECT a.student_id, IFNULL(l.units, 0), a.units
+            FROM actual a
+            LEFT JOIN student_load l ON l.student_id = a.student_id
+            WHERE IFNULL(l.units, 0) != a.units
+            UNION ALL
+            SELECT l.student_id, l.units, 0
+            FROM student_load l
+            WHERE l.units != 0 AND l.student_id NOT IN (SELECT student_id FROM actual)
+        """)
+        drift = [{"student_id": student_id, "ledger": ledger, "actual": actual}
+                 for student_id, ledger, actual in cursor.fetchall()]
+
+        conn.execute("DELETE FROM student_load")
+        conn.execute("""
+            INSERT INTO student_load (student_id, units)
+            SELECT e.student_id, SUM(c.units)
+            FROM enrollments e
+            JOIN courses c ON e.course_code = c.course_code
+            GROUP BY e.student_id
+        """)
+
+    print(f"Unit ledger rebuilt: {len(drift)} student(s) had drifted")
+    return drift
+
+def refresh_dept_stats():
+    """Recomputes dept_stats from scratch and reports departments whose stats had drifted"""
+    with conn:
+        before = {row[0]: row[1:] for row in conn.execute(
+            "SELECT dept_id, num_courses, num_students, enrolled, enrolled_sq FROM dept_stats")}
+
+        conn.execute("DELETE FROM dept_students")
+        conn.execute("DELETE FROM course_stats")
+        conn.execute("DELETE FROM dept_stats")
+        conn.execute("""
+            INSERT INTO course_stats (course_code, dept_id, section_size)
+            SELECT c.course_code, c.dept_id, COUNT(e.course_code)
+            FROM courses c
+            LEFT JOIN enrollments e ON e.course_code = c.course_code
+            GROUP BY c.course_code
+        """)
+        conn.execute("""
+            INSERT INTO dept_students (dept_id, student_id, courses)
+            SELECT c.dept_id, e.student_id, COUNT(*)
+            FROM enrollments e
+            JOIN courses c ON e.course_code = c.course_code
+            WHERE c.dept_id IS NOT NULL
+            GROUP BY c.dept_id, e.student_id
+        """)
+        # the dept_students insert trigger has filled in num_students, the rest is rebuilt here
+        conn.execute("DELETE FROM dept_stats")
+        conn.execute("""
+            INSERT INTO dept_stats (dept_id, num_courses, num_students, enrolled, enrolled_sq)
+            SELECT cs.dept_id, COUNT(*),
+                   (SELECT COUNT(*) FROM dept_students ds WHERE ds.dept_id = cs.dept_id),
+                   SUM(cs.section_size), SUM(cs.section_size * cs.section_size)
+            FROM course_stats cs
+            WHERE cs.dept_id IS NOT NULL
+            GROUP BY cs.dept_id
+        """)
+
+        after = {row[0]: row[1:] for row in conn.execute(
+            "SELECT dept_id, num_courses, num_students, enrolled, enrolled_sq FROM dept_stats")}
+
+    columns = ("num_courses", "num_students", "enrolled", "enrolled_sq")
+    zero = (0, 0, 0, 0)
+    drift = [{"dept_id": dept_id,
+              "stored": dict(zip(columns, before.get(dept_id, zero))),
+              "actual": dict(zip(columns, after.get(dept_id, zero)))}
+             for dept_id in sorted(set(before) | set(after))
+             if before.get(dept_id, zero) != after.get(dept_id, zero)]
+    print(f"Department stats rebuilt: {len(drift)} department(s) had drifted")
+    return drift
+
+# --- FAST READS ---
+
+def fetch_query(name, params=()):
+    """Single-row read of a QUERIES statement on its held cursor, a dict or None"""
+    cursor = conn.run(name, params)
+    rows = cursor.fetchall()  # to the end, so the statement resets (see ConnectionManager.run)
+    if not rows:
+        return None
+    return {column[0]: value for column, value in zip(cursor.description, rows[0])}
+
+def fetch_value(name, params=(), default=None):
+    # first column of the first row of a QUERIES statement
+    rows = conn.run(name, params).fetchall()
+    return rows[0][0] if rows else default
+
+# --- CACHE ---
+
+class LRUCache:
+    """Bounded least-recently-used cache with an optional TTL and hit/miss counters"""
+    def __init__(self, capacity=1024, ttl=60):
+        self.capacity = capacity
+        self.ttl = ttl  # seconds an entry stays valid, None for no expiry
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "capacity": self.capacity, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+# reference rows the hot paths keep re-reading
+course_cache = LRUCache()
+dept_cache = LRUCache()
+prof_cache = LRUCache()
+CACHES = {"courses": course_cache, "departments": dept_cache, "professors": prof_cache}
+
+def configure_caches(capacity=None, ttl=False):
+    # ttl=None disables expiry, so "not given" is False here
+    for cache in CACHES.values():
+        if capacity is not None:
+            cache.capacity = capacity
+        if ttl is not False:
+            cache.ttl = ttl
+        cache.clear()
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+def cached_fetch(cache, name, column, key):
+    # fetch_query through a cache; misses (None) aren't cached so new rows show up at once
+    row = cache.get(key)
+    if row is None:
+        row = fetch_query(name, {column: key})
+        if row is None:
+            return None
+        cache.put(key, row)
+    return dict(row)  # a copy, callers may modify what they get back
+
+def lookup_course(course_code):
+    return cached_fetch(course_cache, "get_course", "course_code", course_code)
+
+def lookup_dept(dept_id):
+    return cached_fetch(dept_cache, "get_dept", "dept_id", dept_id)
+
+def lookup_prof(prof_id):
+    return cached_fetch(prof_cache, "get_prof", "prof_id", prof_id)
+
+# --- STREAMING READS ---
+
+PRIMARY_KEYS = {
+    "departments": "dept_id",
+    "professors": "prof_id",
+    "students": "student_id",
+    "courses": "course_code",
+    "enrollments": "enrollment_no",
+}
+
+def table_columns(table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def iter_rows(table, columns=None, after_id=None, limit=None, chunk_size=1000, record=None, **filters):
+    """Streams rows of a table as dicts in primary-key order, chunk_size rows per fetch"""
+    # record=Student etc. yields instances of that class instead, built by its row factory
+    # keyset pagination: pass the last key seen as after_id to get the next page.
+    # The key column is always selected so callers can continue from it.
+    key = PRIMARY_KEYS[table]
+    known = table_columns(table)
+    selected = list(columns) if columns else list(known)
+    if key not in selected:
+        selected.insert(0, key)
+
+    unknown = [column for column in [*selected, *filters] if column not in known]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {unknown}")
+
+    where, params = [], []
+    if after_id is not None:
+        where.append(f"{key} > ?")
+        params.append(after_id)
+    for column, value in filters.items():
+        if value is not None:  # None means "don't filter on this column"
+            where.append(f"{column} = ?")
+            params.append(value)
+
+    query = f"SELECT {', '.join(selected)} FROM {table}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {key}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    cursor = conn.cursor()
+    if record is not None:
+        cursor.row_factory = record_factory(record)
+    cursor.execute(query, params)
+    names = [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        if record is not None:
+            yield from rows
+        else:
+            for row in rows:
+                yield dict(zip(names, row))
+
+# --- SCHEDULES ---
+
+DAY_LABELS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+DAY_NAMES = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tues": 1, "tue": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thurs": 3, "thur": 3, "thu": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+
+# letter codes for compact day strings like "MWF" or "TTh", two-letter codes first
+DAY_CODES = (("th", 3), ("tu", 1), ("sa", 5), ("su", 6),
+             ("m", 0), ("t", 1), ("w", 2), ("r", 3), ("f", 4), ("s", 5), ("u", 6))
+
+# "MWF 9:00-10:00", "TTh 1:30pm-3pm", "Mon/Wed 10am to 11:30am"; several per schedule
+SLOT_PATTERN = re.compile(
+    r"([A-Za-z][A-Za-z/,\s]*?)\s*"
+    r"(\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)\s*(?:-|–|to)\s*"
+    r"(\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)", re.IGNORECASE)
+
+TIME_PATTERN = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m\.?)?", re.IGNORECASE)
+
+def parse_days(text):
+    days = []
+    for word in re.findall(r"[A-Za-z]+", text.lower()):
+        if word in DAY_NAMES:
+            days.append(DAY_NAMES[word])
+            continue
+        i = 0
+        while i < len(word):
+            for code, day in DAY_CODES:
+                if word.startswith(code, i):
+                    days.append(day)
+                    i += len(code)
+                    break
+            else:
+                return []  # not a day string, e.g. "Room"
+    return days
+
+def parse_time(text, meridiem=None):
+    # minutes after midnight; meridiem is "a"/"p" to use when text has no am/pm
+    match = TIME_PATTERN.fullmatch(text.strip())
+    hour, minute = int(match[1]), int(match[2] or 0)
+    meridiem = (match[3] or meridiem or "").lower()
+    if meridiem == "p" and hour != 12:
+        hour += 12
+    elif meridiem == "a" and hour == 12:
+        hour = 0
+    return hour * 60 + minute
+
+def parse_schedule(schedule):
+    """Parses a free-text schedule into (day, start_min, end_min) slots, [] if unrecognised"""
+    slots = []
+    for days, start_text, end_text in SLOT_PATTERN.findall(schedule or ""):
+        end = parse_time(end_text)
+        end_meridiem = TIME_PATTERN.fullmatch(end_text.strip())[3]
+        start = parse_time(start_text, end_meridiem)
+        if start >= end:  # "11-1pm" means 11am, not 11pm
+            start = parse_time(start_text)
+        if not start < end <= 24 * 60:
+            continue
+        slots.extend((day, start, end) for day in parse_days(days))
+    return sorted(set(slots))
+
+def format_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def format_slot(day, start, end):
+    return f"{DAY_LABELS[day]} {format_time(start)}-{format_time(end)}"
+
+def store_course_slots(courses):
+    # courses = [(course_code, schedule)]; runs inside the caller's transaction
+    conn.run("del_course_slots", [{"course_code": course_code} for course_code, _ in courses], many=True)
+    conn.run("add_course_slot", [{"course_code": course_code, "day": day, "start_min": start, "end_min": end}
+                                 for course_code, schedule in courses
+                                 for day, start, end in parse_schedule(schedule)], many=True)
+
+def sync_course_slots():
+    """Re-parses every course schedule into course_slots"""
+    with conn:
+        conn.execute("DELETE FROM course_slots")
+        store_course_slots(conn.execute("SELECT course_code, schedule FROM courses").fetchall())
+
+class IntervalIndex:
+    """Occupied time per day as sorted, merged intervals; lookups are O(log n)"""
+    def __init__(self):
+        self.starts = {}  # day -> sorted interval starts
+        self.ends = {}    # day -> matching ends (also sorted, intervals never overlap)
+
+    def conflict(self, day, start, end):
+        # True if [start, end) overlaps anything already held on that day
+        starts = self.starts.get(day)
+        if not starts:
+            return False
+        i = bisect_left(starts, end)  # intervals [0, i) start before this one ends
+        return i > 0 and self.ends[day][i - 1] > start
+
+    def add(self, day, start, end):
+        starts = self.starts.setdefault(day, [])
+        ends = self.ends.setdefault(day, [])
+        lo = bisect_left(ends, start)   # first interval that ends at/after our start
+        hi = bisect_right(starts, end)  # intervals starting at/before our end
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi] = [end]
+
+def course_slot_map(where="", params=()):
+    # {course_code: [(day, start, end)]} for course_slots rows matching where
+    slots = {}
+    for course_code, day, start, end in conn.execute(
+            "SELECT course_code, day, start_min, end_min FROM course_slots " + where, params):
+        slots.setdefault(course_code, []).append((day, start, end))
+    return slots
+
+def student_slot_indexes(where="", params=()):
+    # {student_id: IntervalIndex} of the slots held by currently enrolled courses
+    indexes = {}
+    for student_id, day, start, end in conn.execute("""
+            SELECT e.student_id, s.day, s.start_min, s.end_min
+            FROM enrollments e
+            JOIN course_slots s ON s.course_code = e.course_code """ + where, params):
+        indexes.setdefault(student_id, IntervalIndex()).add(day, start, end)
+    return indexes
+
+def first_conflict(index, slots):
+    # the first of a course's slots that clashes with a student's index, or None
+    if index is not None:
+        for slot in slots:
+            if index.conflict(*slot):
+                return slot
+    return None
+
+# --- CASCADING DELETES ---
+
+# What deleting rows of a table also removes or detaches, in order; each step is the
+# QUERIES statement "delete_<table>.<step>". Waitlist rows go before enrollments so
+# the seats a deleted course (or student) frees aren't offered to its own waitlist.
+# Courses outlive their professor and department with the reference set to NULL.
+DELETE_CASCADES = {
+    "students": ("waitlist", "enrollments", "students"),
+    "courses": ("waitlist", "enrollments", "courses"),
+    "professors": ("courses.prof_id", "professors"),
+    "departments": ("courses.dept_id", "students.dept_id", "departments"),
+}
+
+# Tables whose rows block the delete while they still reference it, each counted by
+# "restrict_<table>.<step>": professors.dept_id is NOT NULL, so a department can't
+# be deleted until its professors are moved or deleted.
+DELETE_RESTRICTS = {
+    "departments": ("professors",),
+}
+
+def delete_rows(table, ids):
+    """Deletes rows by primary key along with their dependents, returns {step: rows affected}
+
+    Raises ValueError, deleting nothing, while rows listed in DELETE_RESTRICTS
+    still reference them.
+    """
+    # the ids are staged once and every step is one DELETE/UPDATE ... IN (SELECT ...),
+    # all in one transaction; the maintenance triggers keep the ledgers in step
+    counts = {}
+    with conn.immediate():
+        conn.run("create_delete_ids")
+        conn.run("clear_delete_ids")
+        conn.run("stage_delete_ids", [{"id": row_id} for row_id in ids], many=True)
+        for step in DELETE_RESTRICTS.get(table, ()):
+            referencing = fetch_value(f"restrict_{table}.{step}", default=0)
+            if referencing:
+                raise ValueError(f"{referencing} {step} still reference these {table}")
+        for step in DELETE_CASCADES[table]:
+            counts[step] = conn.run(f"delete_{table}.{step}").rowcount
+        conn.run("clear_delete_ids")
+    return counts
+
+def sweep_orphans():
+    """Removes or detaches rows whose references point at missing rows, returns the counts
+
+    For databases written while foreign keys weren't enforced; enrollments of
+    deleted courses still counted toward the unit cap. The unit ledger and
+    department stats are rebuilt afterwards.
+    """
+    steps = {
+        "waitlist": """DELETE FROM waitlist
+                       WHERE student_id NOT IN (SELECT student_id FROM students)
+                       OR course_code NOT IN (SELECT course_code FROM courses)""",
+        "enrollments": """DELETE FROM enrollments
+                          WHERE student_id NOT IN (SELECT student_id FROM students)
+                          OR course_code NOT IN (SELECT course_code FROM courses)""",
+        "course_slots": "DELETE FROM course_slots WHERE course_code NOT IN (SELECT course_code FROM courses)",
+        "courses.prof_id": """UPDATE courses SET prof_id = NULL
+                              WHERE prof_id NOT IN (SELECT prof_id FROM professors)
+                              OR prof_id IN (SELECT prof_id FROM professors
+                                             WHERE dept_id NOT IN (SELECT dept_id FROM departments))""",
+        "professors": "DELETE FROM professors WHERE dept_id NOT IN (SELECT dept_id FROM departments)",
+        "courses.dept_id": "UPDATE courses SET dept_id = NULL WHERE dept_id NOT IN (SELECT dept_id FROM departments)",
+        "students.dept_id": "UPDATE students SET dept_id = NULL WHERE dept_id NOT IN (SELECT dept_id FROM departments)",
+    }
+    with conn.immediate():
+        counts = {step: conn.execute(query).rowcount for step, query in steps.items()}
+    for cache in CACHES.values():
+        cache.clear()
+    print(f"Orphans swept: {counts}")
+    check_student_load()
+    refresh_dept_stats()
+    return counts
+
+# --- CHANGE LOG ---
+
+def changes_since(seq=0, limit=None, tables=None, chunk_size=1000):
+    """Streams the change_log entries after seq, oldest first, as dicts
+
+    Each entry has seq, table, op ("insert", "update" or "delete"), row_id, the row
+    as a dict (data) and changed_at (Unix time). A consumer keeps the last seq it
+    applied and passes it back next time. tables limits it to some of the tables.
+    Raises ValueError if entries after seq were already purged; re-sync from the tables.
+    """
+    import json
+    purged = fetch_value("change_log_purged", default=0)
+    if seq < purged:
+        raise ValueError(f"change_log was purged up to seq {purged}, past {seq}; re-sync from the tables")
+    # streamed, so on a fresh cursor rather than the held one (see ConnectionManager.run)
+    cursor = conn.execute(QUERIES["changes_since"],
+                          {"seq": seq, "limit": -1 if limit is None else limit,
+                           "tables": None if tables is None else json.dumps(list(tables))})
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for entry_seq, table, op, row_id, data, changed_at in rows:
+            yield {"seq": entry_seq, "table": table, "op": op, "row_id": row_id,
+                   "data": json.loads(data), "changed_at": changed_at}
+
+def last_change_seq():
+    # where a consumer that has just copied the tables starts from
+    return fetch_value("last_change_seq", default=0)
+
+def compact_change_log(upto_seq=None, purge=False):
+    """Shrinks the change log up to upto_seq (default: all of it), returns the entries removed
+
+    By default only superseded entries go: each row keeps its last entry, which
+    carries the whole row, so a consumer applying entries as upserts/deletes
+    still ends up in the same state. purge=True deletes the entries outright;
+    consumers that hadn't read that far must re-sync from the tables.
+    """
+    with conn.immediate():
+        if upto_seq is None:
+            upto_seq = last_change_seq()
+        if purge:
+            removed = conn.run("purge_change_log", {"seq": upto_seq}).rowcount
+            conn.run("set_change_log_purged", {"seq": upto_seq})
+        else:
+            removed = conn.run("collapse_change_log", {"seq": upto_seq}).rowcount
+    print(f"Change log compacted up to seq {upto_seq}: {removed} entries removed")
+    return removed
+
+# --- CLASSES ---
+
+class Record:
+    """Base for the table classes: __slots__ instances, one per row, no per-row dict"""
+    __slots__ = ()
+    _fields = ()  # __init__ argument order, filled in per subclass
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        code = cls.__init__.__code__
+        cls._fields = code.co_varnames[1:code.co_argcount]
+
+    @classmethod
+    def from_dict(cls, row):
+        return cls(*[row.get(field) for field in cls._fields])
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None  # mutable
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.__slots__)})"
+
+def record_factory(cls):
+    """sqlite3 row factory that builds cls instances, e.g. cursor.row_factory = record_factory(Student)"""
+    from operator import itemgetter
+    last = [None, None]  # cursor.description seen last and the getter built for it
+
+    def factory(cursor, row):
+        if cursor.description is not last[0]:
+            names = [column[0] for column in cursor.description]
+            # columns the query didn't select come through as None
+            positions = [names.index(field) if field in names else None for field in cls._fields]
+            if None in positions:
+                last[1] = lambda row: [None if i is None else row[i] for i in positions]
+            elif len(positions) == 1:
+                last[1] = lambda row, i=positions[0]: (row[i],)
+            else:
+                last[1] = itemgetter(*positions)
+            last[0] = cursor.description
+        return cls(*last[1](row))
+    return factory
+
+class Department(Record):
+    __slots__ = ("dept_id", "name")
+
+    def __init__(self, name, dept_id=None):
+        self.dept_id = dept_id
+        self.name = name
+
+    #CREATE
+    @staticmethod #<---just preference for consistency of how i call my func
+    def add_dept(name):
+        with conn:
+            cursor = conn.run("add_dept", {"name": name})
+        print(f"Department of {name} added!")
+        return cursor.lastrowid
+
+    def add_depts(dept_list):
+        #dept_list = ["CS", "Math", "Physics"]
+        with conn:
+            conn.run("add_dept", [{"name": name} for name in dept_list], many=True)
+        print(f"Departments: {len(dept_list)} added!")
+
+    # READ
+    def get_dept(dept_id, as_object=False):
+        try:
+            dept_dict = lookup_dept(dept_id)
+
+            if dept_dict is None:
+                print(f"No department found for dept_id={dept_id}")
+                return None
+
+            if as_object:
+                dept_dict = Department.from_dict(dept_dict)
+            print(dept_dict)
+            return dept_dict
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return None
+
+    def iter_depts(columns=None, after_id=None, limit=None, chunk_size=1000, as_objects=False):
+        # for row in Department.iter_depts(after_id=last_id, limit=500): ...
+        # as_objects=True yields Department instances instead of dicts
+        return iter_rows("departments", columns, after_id, limit, chunk_size,
+                         record=Department if as_objects else None)
+
+    def get_depts(self, after_id=None, limit=None, columns=None, as_objects=False):
+        try:
+            dept_list = list(Department.iter_depts(columns, after_id, limit, as_objects=as_objects))
+
+            if not dept_list:
+                print("No departments found.")
+                return []
+
+            print(dept_list)
+            return dept_list
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return []
+
+    # UPDATE
+    def update_dept(dept_id, name):
+        with conn:
+            conn.run("update_dept", {"name": name, "dept_id": dept_id})
+        dept_cache.invalidate(dept_id)
+        print("update complete")
+
+    def update_depts(dept_list):
+        # dept_list = [(new_name, dept_id)]
+        with conn:
+            conn.run("update_dept", [{"name": name, "dept_id": dept_id} for name, dept_id in dept_list], many=True)
+        dept_cache.invalidate(*[dept_id for _, dept_id in dept_list])
+        print("update complete")
+
+    # DELETE
+    def del_dept(dept_id):
+        return Department.del_depts([dept_id])
+
+    def del_depts(dept_ids):
+        #del_depts([1, 3, 5])
+        # their courses and students stay, without a department; refused while professors belong to them
+        try:
+            counts = delete_rows("departments", dept_ids)
+        except ValueError as e:
+            print(f"deletion denied: {e}")
+            return False
+        dept_cache.invalidate(*dept_ids)
+        course_cache.clear()
+        print(f"deletion complete: {counts}")
+        return counts
+
+class Professor(Record):
+    __slots__ = ("prof_id", "name", "dept_id")
+
+    def __init__(self,name, dept_id, prof_id=None):
+        self.prof_id = prof_id
+        self.name = name
+        self.dept_id = dept_id
+
+    # CREATE
+    @staticmethod
+    def add_prof(name, dept_id):
+        with conn:
+            cursor = conn.run("add_prof", {"name": name, "dept_id": dept_id})
+        print(f"Professor {name} added!")
+        return cursor.lastrowid
+
+    def add_profs(prof_list):
+        # prof_list = [(name, dept_id), (name, dept_id)]
+        with conn:
+            conn.run("add_prof", [{"name": name, "dept_id": dept_id} for name, dept_id in prof_list], many=True)
+        print(f"Professors: {len(prof_list)} added!")
+
+    # READ
+    def get_prof(prof_id, as_object=False):
+        try:
+            prof_dict = lookup_prof(prof_id)
+
+            if prof_dict is None:
+                print(f"No professor found for prof_id={prof_id}")
+                return None
+
+            if as_object:
+                prof_dict = Professor.from_dict(prof_dict)
+            print(prof_dict)
+            return prof_dict
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return None
+
+    def iter_profs(columns=None, after_id=None, limit=None, chunk_size=1000, dept_id=None, as_objects=False):
+        # for row in Professor.iter_profs(after_id=last_id, limit=500): ...
+        return iter_rows("professors", columns, after_id, limit, chunk_size,
+                         record=Professor if as_objects else None, dept_id=dept_id)
+
+    def get_profs(self, after_id=None, limit=None, columns=None, dept_id=None, as_objects=False):
+        try:
+            prof_list = list(Professor.iter_profs(columns, after_id, limit, dept_id=dept_id, as_objects=as_objects))
+
+            if not prof_list:
+                print("No professors found.")
+                return []
+
+            print(prof_list)
+            return prof_list
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return []
+
+    # UPDATE
+    def update_prof(prof_id, name):
+        with conn:
+            conn.run("update_prof", {"name": name, "prof_id": prof_id})
+        prof_cache.invalidate(prof_id)
+        print("update complete")
+
+    def update_profs(prof_list):
+        # prof_list = [(new_name, prof_id)]
+        with conn:
+            conn.run("update_prof", [{"name": name, "prof_id": prof_id} for name, prof_id in prof_list], many=True)
+        prof_cache.invalidate(*[prof_id for _, prof_id in prof_list])
+        print("update complete")
+
+    # DELETE
+    def del_prof(prof_id):
+        return Professor.del_profs([prof_id])
+
+    def del_profs(prof_ids):
+        # prof_ids = [1, 2, 3]
+        # their courses stay, with prof_id set to NULL
+        counts = delete_rows("professors", prof_ids)
+        prof_cache.invalidate(*prof_ids)
+        course_cache.clear()
+        print(f"deletion complete: {counts}")
+        return counts
+
+class Student(Record):
+    __slots__ = ("student_id", "name", "age", "dept_id")
+
+    def __init__(self, name, age, dept_id, student_id=None):
+        self.student_id = student_id
+        self.name = name
+        self.age = age
+        self.dept_id = dept_id
+
+    # CREATE
+    @staticmethod
+    def add_student(name, age, dept_id):
+        with conn:
+            cursor = conn.run("add_student", {"name": name, "age": age, "dept_id": dept_id})
+        print(f"Student {name} added!")
+        return cursor.lastrowid
+
+    def add_students(students_list):
+        # students_list = [(name, age, dept_id)]
+        with conn:
+            conn.run("add_student", [{"name": name, "age": age, "dept_id": dept_id}
+                                     for name, age, dept_id in students_list], many=True)
+        print(f"Students: {len(students_list)} added!")
+
+    # READ
+    def get_student(student_id, as_object=False):
+        try:
+            student_dict = fetch_query("get_student", {"student_id": student_id})
+
+            if student_dict is None:
+                print(f"No student found for student_id={student_id}")
+                return None
+
+            if as_object:
+                student_dict = Student.from_dict(student_dict)
+            print(student_dict)
+            return student_dict
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return None
+
+    def iter_students(columns=None, after_id=None, limit=None, chunk_size=1000, dept_id=None, as_objects=False):
+        # for row in Student.iter_students(after_id=last_id, limit=500): ...
+        return iter_rows("students", columns, after_id, limit, chunk_size,
+                         record=Student if as_objects else None, dept_id=dept_id)
+
+    def get_students(self, after_id=None, limit=None, columns=None, dept_id=None, as_objects=False):
+        try:
+            students = list(Student.iter_students(columns, after_id, limit, dept_id=dept_id, as_objects=as_objects))
+
+            if not students:
+                print("No students found.")
+                return []
+
+            print(students)
+            return students
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return []
+
+    # UPDATE
+    def update_student(student_id, name, age):
+        with conn:
+            conn.run("update_student", {"name": name, "age": age, "student_id": student_id})
+        print("update complete")
+
+    def update_students(students_list):
+        # students_list = [(new_name, students_id)]
+        with conn:
+            conn.run("update_student", [{"name": name, "age": age, "student_id": student_id}
+                                        for name, age, student_id in students_list], many=True)
+        print("update complete")
+
+    # DELETE
+    def del_student(student_id):
+        return Student.del_students([student_id])
+
+    def del_students(student_ids):
+        #del_students([1, 3, 5])
+        # drops their enrollments and waitlist places too; freed seats go to the waitlists
+        counts = delete_rows("students", student_ids)
+        print(f"deletion complete: {counts}")
+        return counts
+
+class Course(Record):
+    __slots__ = ("course_code", "name", "prof_id", "dept_id", "units", "schedule", "capacity")
+    total_units = 0
+    def __init__(self, name, prof_id, dept_id, units, schedule, course_code=None, capacity=None):
+        self.course_code = course_code
+        self.name = name
+        self.prof_id = prof_id
+        self.dept_id = dept_id
+        self.schedule=schedule
+        self.units = units
+        self.capacity = capacity
+
+    # CREATE
+    @staticmethod
+    def add_course(name, prof_id, dept_id, units, schedule, capacity=None):
+        with conn: #<---for transaction rollback, omits error and auto commits on success unlike conn.commit
+            cursor = conn.run("add_course", {"name": name, "prof_id": prof_id, "dept_id": dept_id,
+                                             "units": units, "schedule": schedule, "capacity": capacity})
+            course_code = cursor.lastrowid
+            store_course_slots([(course_code, schedule)])
+        print(f"Course {name} added!")
+        return course_code
+
+    def add_courses(courses_list):
+        # courses_list = [(name, prof_id, dept_id, units, schedule)]
+        with conn:
+            last_code = fetch_value("last_course_code")
+            conn.run("add_course", [{"name": name, "prof_id": prof_id, "dept_id": dept_id, "units": units,
+                                     "schedule": schedule, "capacity": None}
+                                    for name, prof_id, dept_id, units, schedule in courses_list], many=True)
+            # AUTOINCREMENT codes only grow, so the new courses are the ones past last_code
+            store_course_slots(conn.run("course_schedules_after", {"course_code": last_code}).fetchall())
+        print(f"Courses: {len(courses_list)} added!")
+
+    # READ
+    def get_course(course_code, as_object=False):
+        try:
+            course_dict = lookup_course(course_code)
+
+            if course_dict is None:
+                print(f"No course found for course_code={course_code}")
+                return None
+
+            if as_object:
+                course_dict = Course.from_dict(course_dict)
+            print(course_dict)
+            return course_dict
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return None
+
+    def iter_courses(columns=None, after_id=None, limit=None, chunk_size=1000, dept_id=None, prof_id=None,
+                     as_objects=False):
+        # for row in Course.iter_courses(after_id=last_id, limit=500): ...
+        return iter_rows("courses", columns, after_id, limit, chunk_size,
+                         record=Course if as_objects else None, dept_id=dept_id, prof_id=prof_id)
+
+    def get_courses(self, after_id=None, limit=None, columns=None, dept_id=None, prof_id=None, as_objects=False):
+        try:
+            courses = list(Course.iter_courses(columns, after_id, limit, dept_id=dept_id, prof_id=prof_id,
+                                               as_objects=as_objects))
+
+            if not courses:
+                print("No courses found.")
+                return []
+
+            print(courses)
+            return courses
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return []
+
+    # UPDATE
+    def update_course(course_code, name, units, schedule):
+        with conn:
+            cursor = conn.run("update_course", {"name": name, "units": units, "schedule": schedule,
+                                                "course_code": course_code})
+            if cursor.rowcount:  # no slots for a course that doesn't exist
+                store_course_slots([(course_code, schedule)])
+        course_cache.invalidate(course_code)
+        print("update complete")
+
+    def update_courses(courses_list):
+        # courses_list = [(new_name, new_units, schedule, course_code)]
+        import json
+        with conn:
+            conn.run("update_course", [{"name": name, "units": units, "schedule": schedule, "course_code": course_code}
+                                       for name, units, schedule, course_code in courses_list], many=True)
+            # the schedules as stored: only courses that exist, the last update of each
+            codes = json.dumps([course_code for _, _, _, course_code in courses_list])
+            store_course_slots(conn.run("course_schedules_in", {"course_codes": codes}).fetchall())
+        course_cache.invalidate(*[course_code for _, _, _, course_code in courses_list])
+
+    def set_capacity(course_code, capacity):
+        # capacity=None removes the limit; raising it promotes from the waitlist
+        with conn:
+            conn.run("set_capacity", {"capacity": capacity, "course_code": course_code})
+        course_cache.invalidate(course_code)
+        print(f"Course {course_code} capacity set to {capacity}")
+
+    # DELETE
+    def del_course(course_code):
+        return Course.del_courses([course_code])
+
+    def del_courses(course_codes):
+        #del_courses([1, 3, 5])
+        # drops their enrollments and waitlists too
+        counts = delete_rows("courses", course_codes)
+        course_cache.invalidate(*course_codes)
+        print(f"deletion complete: {counts}")
+        return counts
+
+class Enrollment(Record):
+    __slots__ = ("enrollment_no", "student_id", "course_code")
+
+    def __init__(self, student_id, course_code, enrollment_no=None):
+        self.enrollment_no = enrollment_no
+        self.student_id = student_id
+        self.course_code = course_code
+
+    # CREATE
+    @staticmethod
+    def add_enrollment(student_id, course_code, check_conflicts=False, waitlist=False):
+        # The checks and the INSERT share one BEGIN IMMEDIATE transaction, so two
+        # registrations can't both take the last seat or both pass the unit cap.
+        # waitlist=True queues the student when the course is full.
+        # Returns the new enrollment_no, or False if not enrolled (waitlisted included).
+        try:
+            with conn.immediate():
+                # units and capacity are read under the write lock, never from course_cache:
+                # another connection may have just changed them
+                course = fetch_query("get_course", {"course_code": course_code})
+                if course is None:
+                    print(f"Enrollment failed: no course found for course_code={course_code}")
+                    return False
+                new_course_units = course["units"]
+
+                pair = {"student_id": student_id, "course_code": course_code}
+                if fetch_value("is_enrolled", pair):
+                    print(f"Enrollment failed: student {student_id} is already in course {course_code}")
+                    return False
+
+                #Check total enrolled units for this student ---
+                current_units = fetch_value("student_units", {"student_id": student_id}, 0)
+
+                if current_units + new_course_units > MAX_UNITS:
+                    print(f"Enrollment denied: total would be {current_units + new_course_units} units (limit is {MAX_UNITS}).")
+                    return False
+
+                if check_conflicts:
+                    index = student_slot_indexes("WHERE e.student_id = ?", (student_id,)).get(student_id)
+                    clash = first_conflict(index, course_slot_map("WHERE course_code = ?", (course_code,)).get(course_code, []))
+                    if clash:
+                        print(f"Enrollment denied: schedule conflict on {format_slot(*clash)}.")
+                        return False
+
+                if course["capacity"] is not None:
+                    taken = fetch_value("section_size", {"course_code": course_code}, 0)
+                    if taken >= course["capacity"]:
+                        if not waitlist:
+                            print(f"Enrollment denied: course {course_code} is full ({course['capacity']} seats).")
+                            return False
+                        conn.run("add_waitlist", pair)
+                        position = fetch_value("waitlist_position", pair)
+                        print(f"Course {course_code} is full: waitlisted at position {position}")
+                        return False
+
+                cursor = conn.run("add_enrollment", {"student_id": student_id, "course_code": course_code})
+            print("Enrollment successful")
+            return cursor.lastrowid
+        except sqlite3.IntegrityError as e:
+            print(f"Enrollment failed: {e}")
+            return False
+
+    def add_enrollments(enrollments_list, check_conflicts=False):
+        # enrollments_list = [(student_id, course_code)]
+        # Set-based: the batch is staged once, unit totals and course units are
+        # fetched with one query each, and the cap is applied in batch order.
+        # check_conflicts also rejects pairs whose course clashes with the
+        # student's timetable, including courses accepted earlier in the batch.
+        # BEGIN IMMEDIATE keeps the seat counts and totals valid until the insert.
+        results = []
+        with conn.immediate():
+            conn.run("create_enroll_batch")
+            conn.run("clear_enroll_batch")
+            conn.run("stage_enroll_batch", [{"seq": seq, "student_id": student_id, "course_code": course_code}
+                                            for seq, (student_id, course_code) in enumerate(enrollments_list)],
+                     many=True)
+
+            students = {student_id for student_id, in conn.run("batch_students").fetchall()}
+            current_units = dict(conn.run("batch_student_units").fetchall())
+
+            course_units, capacity, taken = {}, {}, {}
+            for course_code, units, seats, section_size in conn.run("batch_courses").fetchall():
+                course_units[course_code] = units
+                capacity[course_code] = seats
+                taken[course_code] = section_size
+
+            enrolled = set(conn.run("batch_enrolled").fetchall())
+
+            if check_conflicts:
+                slot_indexes = student_slot_indexes(
+                    "WHERE e.student_id IN (SELECT student_id FROM temp.enroll_batch)")
+                course_slots = course_slot_map(
+                    "WHERE course_code IN (SELECT course_code FROM temp.enroll_batch)")
+
+            accepted = []
+            for student_id, course_code in enrollments_list:
+                result = {"student_id": student_id, "course_code": course_code,
+                          "accepted": False, "reason": None}
+                results.append(result)
+
+                if student_id not in students:
+                    result["reason"] = "student not found"
+                    continue
+                units = course_units.get(course_code)
+                if units is None:
+                    result["reason"] = "course not found"
+                    continue
+                if (student_id, course_code) in enrolled:
+                    result["reason"] = "already enrolled"
+                    continue
+
+                total = current_units.get(student_id, 0) + units
+                if total > MAX_UNITS:
+                    result["reason"] = f"total would be {total} units (limit is {MAX_UNITS})"
+                    continue
+
+                if capacity[course_code] is not None and taken[course_code] >= capacity[course_code]:
+                    result["reason"] = f"course is full ({capacity[course_code]} seats)"
+                    continue
+
+                if check_conflicts:
+                    slots = course_slots.get(course_code, [])
+                    clash = first_conflict(slot_indexes.get(student_id), slots)
+                    if clash:
+                        result["reason"] = f"schedule conflict on {format_slot(*clash)}"
+                        continue
+                    index = slot_indexes.setdefault(student_id, IntervalIndex())
+                    for slot in slots:
+                        index.add(*slot)
+
+                # Later pairs in the same batch see this one's units and seat
+                current_units[student_id] = total
+                taken[course_code] += 1
+                enrolled.add((student_id, course_code))
+                accepted.append((student_id, course_code))
+                result["accepted"] = True
+
+            conn.run("add_enrollment", [{"student_id": student_id, "course_code": course_code}
+                                        for student_id, course_code in accepted], many=True)
+            conn.run("clear_enroll_batch")
+
+        print(f"Enrollments: {len(accepted)} added, {len(results) - len(accepted)} denied")
+        return results
+
+    def leave_waitlist(student_id, course_code):
+        with conn:
+            conn.run("leave_waitlist", {"student_id": student_id, "course_code": course_code})
+        print("removed from waitlist")
+
+    # READ
+    def get_waitlist(course_code):
+        # [{"position", "student_id", "waitlist_no"}] in promotion order
+        rows = conn.run("get_waitlist", {"course_code": course_code}).fetchall()
+        return [{"position": position, "student_id": student_id, "waitlist_no": waitlist_no}
+                for position, (student_id, waitlist_no) in enumerate(rows, 1)]
+
+    def get_enrollment(enrollment_no, as_object=False):
+        try:
+            enrollment_dict = fetch_query("get_enrollment", {"enrollment_no": enrollment_no})
+
+            if enrollment_dict is None:
+                print(f"No enrollment found for enrollment_no={enrollment_no}")
+                return None
+
+            if as_object:
+                enrollment_dict = Enrollment.from_dict(enrollment_dict)
+            print(enrollment_dict)
+            return enrollment_dict
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return None
+
+    def iter_enrollments(columns=None, after_id=None, limit=None, chunk_size=1000, student_id=None, course_code=None,
+                         as_objects=False):
+        # for row in Enrollment.iter_enrollments(after_id=last_id, limit=500): ...
+        return iter_rows("enrollments", columns, after_id, limit, chunk_size,
+                         record=Enrollment if as_objects else None, student_id=student_id, course_code=course_code)
+
+    def get_enrollments(self, after_id=None, limit=None, columns=None, student_id=None, course_code=None,
+                        as_objects=False):
+        try:
+            enrollments = list(Enrollment.iter_enrollments(columns, after_id, limit, student_id=student_id,
+                                                           course_code=course_code, as_objects=as_objects))
+
+            if not enrollments:
+                print("No enrollments found.")
+                return []
+
+            print(enrollments)
+            return enrollments
+
+        except Exception as e:
+            logger.exception("Database error: %s", e)
+            return []
+
+    # UPDATE
+    #Enrollment contains only primary keys and foreign keys, updating it directly is a bad idea
+
+    # DELETE
+    def del_enrollment(enrollment_no):
+        with conn:
+            conn.run("del_enrollment", {"enrollment_no": enrollment_no})
+        print("deletion complete")
+
+    def del_enrollments(enrollment_nos):
+        #del_enrollments([1, 3, 5])
+        with conn:
+            conn.run("del_enrollment", [{"enrollment_no": enrollment_no} for enrollment_no in enrollment_nos],
+                     many=True)
+        print("deletion complete")
+
+# --- ANALYTICS SNAPSHOT ---
+
+# Enrollment facts as NumPy arrays, one .npy file per column plus meta.json, so the
+# aggregate reports can memory-map them and group by with bincount instead of
+# querying SQLite. Departments, courses and professors are integer-coded by their
+# position in the sorted id arrays (-1 for a NULL reference). meta.json records the
+# database it came from and its data_version(); a snapshot behind the database is
+# rebuilt on load. The column files carry the build's version in their names and
+# meta.json, replaced last, says which ones to map.
+SNAPSHOT_PATH = None  # None: next to the database, "enrollment.db" -> "enrollment_snapshot"
+SNAPSHOT_COLUMNS = {
+    "dept_ids": "SELECT dept_id FROM departments ORDER BY dept_id",
+    "prof_ids": "SELECT prof_id FROM professors ORDER BY prof_id",
+    "course_codes": "SELECT course_code FROM courses ORDER BY course_code",
+    "course_dept": "SELECT dept_id FROM courses ORDER BY course_code",
+    "course_prof": "SELECT prof_id FROM courses ORDER BY course_code",
+    "course_units": "SELECT units FROM courses ORDER BY course_code",
+    "enroll_student": "SELECT student_id FROM enrollments ORDER BY course_code, student_id",
+    "enroll_course": "SELECT course_code FROM enrollments ORDER BY course_code, student_id",
+}
+_snapshots = {}  # path -> loaded snapshot
+
+def _column(query, dtype):
+    import numpy as np
+    cursor = conn.execute(query)
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(100000)
+        if not rows:
+            break
+        chunks.append(np.array([-1 if value is None else value for value, in rows], dtype=dtype))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+def _encode(values, ids):
+    # ids -> position in the sorted ids array, -1 where missing or NULL
+    import numpy as np
+    codes = np.searchsorted(ids, values).astype(np.int32)
+    codes[codes >= len(ids)] = 0
+    found = (values >= 0) & (ids[codes] == values) if len(ids) else np.zeros(len(values), dtype=bool)
+    codes[~found] = -1
+    return codes
+
+def snapshot_path(path=None):
+    """Where the snapshot of the open database lives: path, else SNAPSHOT_PATH, else next to the database"""
+    import os
+    path = path or SNAPSHOT_PATH
+    if path:
+        return path
+    if conn.path == ":memory:":
+        raise ValueError("an in-memory database needs an explicit snapshot path")
+    return os.path.splitext(conn.path)[0] + "_snapshot"
+
+def build_snapshot(path=None):
+    """Exports the enrollment facts to a columnar snapshot directory"""
+    import json
+    import os
+    import uuid
+    import numpy as np
+    path = snapshot_path(path)
+
+    # one read transaction so every column sees the same data; a savepoint begins
+    # one, or nests in the caller's
+    with conn.savepoint():
+        version = data_version()
+        raw = {name: _column(query, np.int64) for name, query in SNAPSHOT_COLUMNS.items()}
+        dept_names = [name for name, in conn.execute("SELECT name FROM departments ORDER BY dept_id")]
+
+    columns = {
+        "dept_ids": raw["dept_ids"].astype(np.int32),
+        "prof_ids": raw["prof_ids"].astype(np.int32),
+        "course_codes": raw["course_codes"].astype(np.int32),
+        "course_dept": _encode(raw["course_dept"], raw["dept_ids"]),
+        "course_prof": _encode(raw["course_prof"], raw["prof_ids"]),
+        "course_units": raw["course_units"].astype(np.int16),
+        "enroll_student": raw["enroll_student"].astype(np.int32),
+        "enroll_course": _encode(raw["enroll_course"], raw["course_codes"]),
+    }
+    meta = {"built_at": time.time(), "version": uuid.uuid4().hex, "source": os.path.abspath(conn.path),
+            "data_version": version, "dept_names": dept_names,
+            "rows": {name: len(values) for name, values in columns.items()}}
+
+    # new files under new names, then one os.replace of meta.json publishes them all
+    # at once. The previous build's files stay for readers that have just read the
+    # old meta.json; older ones are removed.
+    os.makedirs(path, exist_ok=True)
+    previous = _read_meta(path)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.{meta['version']}.npy"), values)
+    tmp = os.path.join(path, f".meta.{meta['version']}.json")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+    keep = {meta["version"], previous.get("version") if previous else None}
+    for filename in os.listdir(path):
+        if filename.endswith(".npy") and filename.split(".")[-2] not in keep:
+            try:
+                os.remove(os.path.join(path, filename))
+            except FileNotFoundError:  # a concurrent build got there first
+                pass
+
+    _snapshots.pop(path, None)
+    print(f"Snapshot written to {path}: {meta['rows']['enroll_course']} enrollments")
+    return meta
+
+def _read_meta(path):
+    import json
+    import os
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def load_snapshot(path=None):
+    """Memory-maps a snapshot of the open database, (re)building it if missing or behind
+
+    Raises ValueError if the snapshot at path was built from another database.
+    """
+    import os
+    import numpy as np
+    path = snapshot_path(path)
+    source, version = os.path.abspath(conn.path), data_version()
+
+    snapshot = _snapshots.get(path)
+    if snapshot is not None and snapshot["meta"]["data_version"] == version:
+        return snapshot
+    for attempt in range(3):
+        meta = _read_meta(path)
+        if meta is not None and meta.get("source", source) != source:
+            raise ValueError(f"snapshot {path} was built from {meta['source']}, not {source}")
+        if meta is None or meta.get("data_version") != version:
+            meta = build_snapshot(path)
+        try:
+            snapshot = {"meta": meta}
+            for name in SNAPSHOT_COLUMNS:
+                snapshot[name] = np.load(os.path.join(path, f"{name}.{meta['version']}.npy"), mmap_mode="r")
+            break
+        except FileNotFoundError:  # two builds went by since meta.json was read
+            if attempt == 2:
+                raise
+    _snapshots[path] = snapshot
+    return snapshot
+
+def snapshot_enrollments_by_department(snapshot):
+    """total_enrollments per department name, the same frame ENROLLMENT_BY_DEPARTMENT_SQL gives"""
+    import numpy as np
+    import pandas as pd
+    depts = len(snapshot["dept_ids"])
+    enroll_course = np.asarray(snapshot["enroll_course"])
+    enroll_dept = np.asarray(snapshot["course_dept"])[enroll_course[enroll_course >= 0]]
+    totals = np.bincount(enroll_dept[enroll_dept >= 0], minlength=depts)
+    df = pd.DataFrame({"department": snapshot["meta"]["dept_names"], "total_enrollments": totals.astype(np.int64)})
+    # the SQL groups by name
+    return df.groupby("department", as_index=False, sort=True)["total_enrollments"].sum()
+
+def snapshot_department_summary(snapshot):
+    """The DEPARTMENT_SUMMARY_SQL frame computed from the snapshot"""
+    import numpy as np
+    import pandas as pd
+    depts = len(snapshot["dept_ids"])
+    course_dept = np.asarray(snapshot["course_dept"])
+    enroll_course = np.asarray(snapshot["enroll_course"])
+    enroll_student = np.asarray(snapshot["enroll_student"])[enroll_course >= 0]
+    enroll_course = enroll_course[enroll_course >= 0]
+
+    has_dept = course_dept >= 0
+    num_courses = np.bincount(course_dept[has_dept], minlength=depts)
+    sizes = np.bincount(enroll_course, minlength=len(course_dept)).astype(np.int64)
+    enrolled = np.bincount(course_dept[has_dept], weights=sizes[has_dept], minlength=depts)
+    enrolled_sq = np.bincount(course_dept[has_dept], weights=sizes[has_dept] ** 2, minlength=depts)
+
+    # distinct (department, student) pairs
+    enroll_dept = course_dept[enroll_course]
+    keep = enroll_dept >= 0
+    pairs = np.sort(enroll_dept[keep].astype(np.int64) << 32 | enroll_student[keep])
+    if len(pairs):
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    num_students = np.bincount((pairs >> 32).astype(np.int64), minlength=depts)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg = np.where(enrolled > 0, enrolled_sq / enrolled, np.nan)
+    df = pd.DataFrame({"department": snapshot["meta"]["dept_names"],
+                       "num_courses": num_courses.astype(np.int64),
+                       "num_students": num_students.astype(np.int64),
+                       "avg_section_size": np.round(avg, 2)})
+    return df.sort_values("department", kind="stable", ignore_index=True)
+
+#REPORTS & ANALYTICS
+
+def read_frame(name, params=()):
+    """A QUERIES statement as a DataFrame, the same frame pd.read_sql_query builds"""
+    # runs on the statement's held cursor; read_sql_query opens a cursor and
+    # goes through pandas' SQL layer on every call
+    return _frame(conn.run(name, params))
+
+def _frame(cursor):
+    import pandas as pd
+    rows = cursor.fetchall()
+    return pd.DataFrame.from_records(rows, columns=[column[0] for column in cursor.description], coerce_float=True)
+
+# courses without a professor (or students) are kept, with NULLs; {where} is "" or one course
+COURSE_ROSTER_SQL = """
+SELECT 
+    c.course_code,
+    c.name AS course_name,
+    p.name AS professor_name,
+    s.name AS student_name
+FROM courses c
+LEFT JOIN professors p ON c.prof_id = p.prof_id
+LEFT JOIN enrollments e ON c.course_code = e.course_code
+LEFT JOIN students s ON e.student_id = s.student_id
+{where}
+ORDER BY c.course_code, s.name;
+"""
+
+# one row per course; the GROUP BY reads only idx_enrollments_course
+COURSE_COUNTS_SQL = """
+SELECT
+    c.course_code,
+    c.name AS course_name,
+    p.name AS professor_name,
+    IFNULL(n.enrolled, 0) AS enrolled
+FROM courses c
+LEFT JOIN professors p ON c.prof_id = p.prof_id
+LEFT JOIN (SELECT course_code, COUNT(*) AS enrolled FROM enrollments {where} GROUP BY course_code) n
+    ON n.course_code = c.course_code
+{course_where}
+ORDER BY c.course_code;
+"""
+
+# students ranked by name within each course, rows offset+1 .. offset+limit of every course
+COURSE_PAGE_SQL = """
+SELECT course_code, course_name, professor_name, position, student_name
+FROM (
+    SELECT
+        c.course_code,
+        c.name AS course_name,
+        p.name AS professor_name,
+        ROW_NUMBER() OVER (PARTITION BY c.course_code ORDER BY s.name, s.student_id) AS position,
+        s.name AS student_name
+    FROM courses c
+    LEFT JOIN professors p ON c.prof_id = p.prof_id
+    LEFT JOIN enrollments e ON c.course_code = e.course_code
+    LEFT JOIN students s ON e.student_id = s.student_id
+    {where})
+WHERE position > :offset AND position <= :offset + :limit
+ORDER BY course_code, position;
+"""
+
+ROSTER_MODES = ("full", "counts", "paged")
+
+def course_roster(course_code=None, mode="full", limit=50, offset=0):
+    """ Course roster with professor name and enrolled student list"""
+    # mode="full": one row per (course, student); "counts": one row per course with its
+    # enrolled count; "paged": students offset+1 .. offset+limit of each course, by name.
+    # course_code limits any mode to that course.
+    if mode not in ROSTER_MODES:
+        raise ValueError(f"unknown roster mode {mode!r}, expected one of {', '.join(ROSTER_MODES)}")
+    name = {"full": "course_roster", "counts": "course_roster_counts", "paged": "course_roster_paged"}[mode]
+    params = {}
+    if course_code is not None:
+        name += "_course"
+        params["course_code"] = course_code
+    if mode == "paged":
+        params.update(limit=limit, offset=offset)
+    df = read_frame(name, params)
+    print("COURSE ROSTER")
+    if df.empty:
+        print("No enrollments found.")
+    else:
+        print(df)
+    return df
+
+STUDENT_TIMETABLE_SQL = """
+SELECT 
+    s.name AS student_name,
+    c.name AS course_name,
+    c.units,
+    c.schedule,  -- 🆕 show the schedule
+    p.name AS professor_name,
+    d.name AS department_name
+FROM enrollments e
+JOIN students s ON e.student_id = s.student_id
+JOIN courses c ON e.course_code = c.course_code
+LEFT JOIN professors p ON c.prof_id = p.prof_id  -- courses outlive their professor and department
+LEFT JOIN departments d ON c.dept_id = d.dept_id
+WHERE s.student_id = :student_id
+"""
+
+def student_timetable(student_id):
+    """Individual student’s timetable"""
+    df = read_frame("student_timetable", {"student_id": student_id})
+    print(f"TIMETABLE FOR STUDENT {student_id}")
+    if df.empty:
+        print("No courses enrolled.")
+    else:
+        print(df)
+        print(f"Total Units: {df['units'].sum()}")
+    return df
+
+# every timetable in one pass, ordered so each student's rows arrive together
+ALL_TIMETABLES_SQL = """
+SELECT
+    e.student_id,
+    s.name AS student_name,
+    c.name AS course_name,
+    c.units,
+    c.schedule,
+    p.name AS professor_name,
+    d.name AS department_name
+FROM enrollments e
+JOIN students s ON e.student_id = s.student_id
+JOIN courses c ON e.course_code = c.course_code
+LEFT JOIN professors p ON c.prof_id = p.prof_id  -- courses outlive their professor and department
+LEFT JOIN departments d ON c.dept_id = d.dept_id
+{where}
+ORDER BY e.student_id, c.name
+"""
+TIMETABLE_COLUMNS = ["course_name", "units", "schedule", "professor_name", "department_name"]
+
+def iter_timetables(student_ids=None, chunk_size=5000):
+    """Yields (student_id, student_name, courses, total_units) for every enrolled student
+
+    One ordered query instead of a student_timetable() per student; courses is a
+    list of dicts keyed by TIMETABLE_COLUMNS. Students with no enrollments are skipped.
+    """
+    import json
+    # streamed, so on a fresh cursor rather than the held one (see ConnectionManager.run)
+    if student_ids is None:
+        cursor = conn.execute(QUERIES["iter_timetables"])
+    else:
+        cursor = conn.execute(QUERIES["iter_timetables_for"], {"student_ids": json.dumps(list(student_ids))})
+
+    current, name, courses, total = None, None, [], 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for student_id, student_name, *course in rows:
+            if student_id != current:
+                if current is not None:
+                    yield current, name, courses, total
+                current, name, courses, total = student_id, student_name, [], 0
+            courses.append(dict(zip(TIMETABLE_COLUMNS, course)))
+            total += course[1]
+    if current is not None:
+        yield current, name, courses, total
+
+def format_timetable(student_id, student_name, courses, total_units, fmt="txt"):
+    """One student's timetable as text, CSV or HTML"""
+    if fmt == "csv":
+        import csv
+        import io
+        out = io.StringIO()
+        writer = csv.DictWriter(out, TIMETABLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(courses)
+        return out.getvalue()
+    if fmt == "html":
+        from html import escape
+        header = "".join(f"<th>{escape(column)}</th>" for column in TIMETABLE_COLUMNS)
+        body = "".join("<tr>" + "".join(f"<td>{escape(str(course[column]))}</td>" for column in TIMETABLE_COLUMNS)
+                       + "</tr>\n" for course in courses)
+        return (f"<h1>Timetable for {escape(student_name)} ({student_id})</h1>\n"
+                f"<table>\n<tr>{header}</tr>\n{body}</table>\n<p>Total Units: {total_units}</p>\n")
+    if fmt != "txt":
+        raise ValueError(f"unknown timetable format {fmt!r}, expected 'txt', 'csv' or 'html'")
+    widths = {column: max([len(column)] + [len(str(course[column])) for course in courses])
+              for column in TIMETABLE_COLUMNS}
+    lines = [f"TIMETABLE FOR STUDENT {student_id} ({student_name})",
+             "  ".join(column.ljust(widths[column]) for column in TIMETABLE_COLUMNS).rstrip()]
+    lines += ["  ".join(str(course[column]).ljust(widths[column]) for column in TIMETABLE_COLUMNS).rstrip()
+              for course in courses]
+    lines.append(f"Total Units: {total_units}")
+    return "\n".join(lines) + "\n"
+
+def _write_timetables(out_dir, fmt, batch):
+    # runs in the worker processes; batch is a list of iter_timetables() tuples
+    import os
+    for timetable in batch:
+        with open(os.path.join(out_dir, f"student_{timetable[0]}.{fmt}"), "w", encoding="utf-8") as f:
+            f.write(format_timetable(*timetable, fmt=fmt))
+    return len(batch)
+
+def render_timetables(out_dir, fmt="txt", workers=None, student_ids=None, batch_size=500):
+    """Writes one timetable file per enrolled student, formatting on a process pool
+
+    This process streams the timetables and hands them out in batches; at most
+    two batches per worker are queued at a time so memory stays flat.
+    workers=0 renders in this process.
+    """
+    import os
+    os.makedirs(out_dir, exist_ok=True)
+    format_timetable(0, "", [], 0, fmt)  # fail on a bad format before starting any work
+    start, written = time.perf_counter(), 0
+
+    def batches():
+        batch = []
+        for timetable in iter_timetables(student_ids):
+            batch.append(timetable)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    if workers == 0:
+        for batch in batches():
+            written += _write_timetables(out_dir, fmt, batch)
+    else:
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for batch in batches():
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    written += sum(future.result() for future in done)
+                pending.add(pool.submit(_write_timetables, out_dir, fmt, batch))
+            written += sum(future.result() for future in pending)
+
+    elapsed = time.perf_counter() - start
+    print(f"Timetables: {written} written to {out_dir} in {elapsed:.1f}s")
+    return {"students": written, "seconds": elapsed}
+
+DEPARTMENT_SUMMARY_SQL = """
+SELECT 
+    d.name AS department,
+    IFNULL(ds.num_courses, 0) AS num_courses,
+    IFNULL(ds.num_students, 0) AS num_students,
+    ROUND(ds.enrolled_sq * 1.0 / NULLIF(ds.enrolled, 0), 2) AS avg_section_size
+FROM departments d
+LEFT JOIN dept_stats ds ON ds.dept_id = d.dept_id
+ORDER BY d.name;
+"""
+
+def department_summary(refresh=False, live=True):
+    """Department-level summary (#courses, #students, average section size)"""
+    # reads the trigger-maintained dept_stats table, refresh=True recomputes it first;
+    # live=False computes it from the analytics snapshot instead
+    if not live:
+        df = snapshot_department_summary(load_snapshot())
+    else:
+        if refresh:
+            refresh_dept_stats()
+        df = read_frame("department_summary")
+    print("DEPARTMENT SUMMARY")
+    if df.empty:
+        print("No data found.")
+    else:
+        print(df)
+    return df
+
+ENROLLMENT_BY_DEPARTMENT_SQL = """
+SELECT 
+    d.name AS department,
+    COUNT(e.enrollment_no) AS total_enrollments
+FROM departments d
+LEFT JOIN courses c ON d.dept_id = c.dept_id
+LEFT JOIN enrollments e ON c.course_code = e.course_code
+GROUP BY d.name;
+"""
+
+def plot_enrollment_by_department(live=True, path=None, fmt=None):
+    """Optional pandas visualization: total enrollments per department"""
+    # path="chart.png" (or .svg) renders headless through render_chart() instead of plt.show();
+    # call render_chart() directly for the image bytes
+    df = chart_frame("enrollment_by_department", live)
+    if path is not None:
+        render_chart("enrollment_by_department", fmt, path, live)  # cached by data version, not redrawn from df
+        return df
+
+    import matplotlib.pyplot as plt
+    ax = df.plot(kind='bar', x='department', y='total_enrollments', title='Enrollments per Department')
+    plt.show()
+    plt.close(ax.figure)  # with a non-interactive backend show() returns at once and the figure would pile up
+    return df
+
+
+ENROLLMENT_RANKING_SQL = """
+SELECT 
+    d.name AS department,
+    COUNT(e.enrollment_no) AS total_enrollments
+FROM departments d
+LEFT JOIN courses c ON d.dept_id = c.dept_id
+LEFT JOIN enrollments e ON c.course_code = e.course_code
+GROUP BY d.name
+ORDER BY total_enrollments DESC;
+"""
+
+def analyze_enrollment_by_department(live=True, path=None, fmt=None):
+    """Exports enrollments per department into a DataFrame and visualizes results."""
+    # path="chart.png" (or .svg) renders headless through render_chart() instead of plt.show()
+
+    # --- Step 1: Query the database (or the analytics snapshot) into a pandas DataFrame ---
+    df = chart_frame("enrollment_ranking", live)
+
+    # --- Step 2: Display DataFrame content ---
+    print("ENROLLMENTS PER DEPARTMENT")
+    print(df)
+
+    # --- Step 3: Simple descriptive analysis ---
+    total = df["total_enrollments"].sum()
+    avg = df["total_enrollments"].mean()
+    most = df.loc[df["total_enrollments"].idxmax(), "department"] if not df.empty else None
+
+    print("ANALYSIS SUMMARY")
+    print(f"Total Enrollments: {total}")
+    print(f"Average Enrollments per Department: {avg:.2f}")
+    print(f"Department with Most Enrollments: {most}")
+
+    # --- Step 4: Visualization ---
+    if path is not None:
+        render_chart("enrollment_ranking", fmt, path, live)  # cached by data version, not redrawn from df
+        return df
+
+    import matplotlib.pyplot as plt
+    ax = df.plot(kind='bar', x='department', y='total_enrollments',
+                 title='Enrollments per Department', legend=False, figsize=(7, 4))
+    plt.show()
+    plt.close(ax.figure)
+    return df
+
+SCHEDULE_SLOTS_SQL = """
+SELECT e.student_id, s.day, s.start_min, s.end_min, e.course_code
+FROM enrollments e
+JOIN course_slots s ON s.course_code = e.course_code
+ORDER BY e.student_id, s.day, s.start_min;
+"""
+
+def find_conflicts():
+    """Schedule conflicts for every student, found in one pass over all enrolled slots"""
+    import pandas as pd
+    # Slots arrive sorted by (student, day, start). A sweep keeps the slots still
+    # running at the current start time; each of those from another course clashes.
+    conflicts = []
+    current, active = None, []
+    cursor = conn.execute(QUERIES["find_conflicts"])
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        for student_id, day, start, end, course_code in rows:
+            if (student_id, day) != current:
+                current, active = (student_id, day), []
+            active = [slot for slot in active if slot[1] > start]
+            for other_start, other_end, other_course in active:
+                if other_course != course_code:
+                    conflicts.append((student_id, DAY_LABELS[day], other_course, course_code,
+                                      f"{format_time(start)}-{format_time(min(end, other_end))}"))
+            active.append((start, end, course_code))
+
+    df = pd.DataFrame(conflicts, columns=["student_id", "day", "course_code", "conflicting_course", "overlap"])
+    print("SCHEDULE CONFLICTS")
+    if df.empty:
+        print("No conflicts found.")
+    else:
+        print(df)
+    return df
+
+# the report statements in the QUERIES registry
+QUERIES.update({
+    "course_roster": COURSE_ROSTER_SQL.format(where=""),
+    "course_roster_course": COURSE_ROSTER_SQL.format(where="WHERE c.course_code = :course_code"),
+    "course_roster_counts": COURSE_COUNTS_SQL.format(where="", course_where=""),
+    "course_roster_counts_course": COURSE_COUNTS_SQL.format(where="WHERE course_code = :course_code",
+                                                            course_where="WHERE c.course_code = :course_code"),
+    "course_roster_paged": COURSE_PAGE_SQL.format(where=""),
+    "course_roster_paged_course": COURSE_PAGE_SQL.format(where="WHERE c.course_code = :course_code"),
+    "student_timetable": STUDENT_TIMETABLE_SQL,
+    "iter_timetables": ALL_TIMETABLES_SQL.format(where=""),
+    "iter_timetables_for": ALL_TIMETABLES_SQL.format(
+        where="WHERE e.student_id IN (SELECT value FROM json_each(:student_ids))"),
+    "department_summary": DEPARTMENT_SUMMARY_SQL,
+    "enrollment_by_department": ENROLLMENT_BY_DEPARTMENT_SQL,
+    "enrollment_ranking": ENROLLMENT_RANKING_SQL,
+    "find_conflicts": SCHEDULE_SLOTS_SQL,
+})
+
+# --- CHARTS ---
+
+# bar charts render_chart() can draw, by the QUERIES report behind each, with their df.plot() options
+CHARTS = {
+    "enrollment_by_department": {"title": "Enrollments per Department"},
+    "enrollment_ranking": {"title": "Enrollments per Department", "legend": False, "figsize": (7, 4)},
+}
+chart_cache = LRUCache(capacity=64, ttl=None)  # rendered bytes by content hash, and data version -> hash
+CACHES["charts"] = chart_cache
+
+def data_version():
+    """Counter bumped by the triggers on every enrollment, course or department change"""
+    return fetch_value("data_version", default=0)
+
+def chart_frame(chart, live=True):
+    """The DataFrame a chart plots, from the live database or the analytics snapshot"""
+    if live:
+        return read_frame(chart)
+    df = snapshot_enrollments_by_department(load_snapshot())
+    if chart == "enrollment_ranking":
+        df = df.sort_values("total_enrollments", ascending=False, kind="stable", ignore_index=True)
+    return df
+
+def render_chart(chart="enrollment_by_department", fmt=None, path=None, live=True, df=None):
+    """Draws a chart with the Agg renderer and returns the PNG or SVG bytes, also written to path if given
+
+    Charts are cached by a hash of the data plotted, so a chart whose data hasn't
+    changed is never drawn twice; while data_version() is unchanged the query is
+    skipped too. fmt defaults to path's extension, else "png". live=False charts the
+    analytics snapshot; df skips the query and charts the frame given.
+    """
+    import hashlib
+    import os
+    if chart not in CHARTS:
+        raise ValueError(f"unknown chart {chart!r}, expected one of {', '.join(CHARTS)}")
+    fmt = (fmt or (os.path.splitext(path)[1].lstrip(".") if path else "") or "png").lower()
+    if fmt not in ("png", "svg"):
+        raise ValueError(f"unknown chart format {fmt!r}, expected 'png' or 'svg'")
+
+    version_key = None
+    if df is None:
+        version = data_version() if live else load_snapshot()["meta"]["built_at"]
+        version_key = (conn.path, chart, fmt, live, version)
+        digest = chart_cache.get(version_key)
+        image = chart_cache.get(digest) if digest else None
+        if image is None:
+            df = chart_frame(chart, live)
+
+    if df is not None:
+        digest = hashlib.sha256(f"{chart}\0{fmt}\0{df.to_csv(index=False)}".encode()).hexdigest()
+        image = chart_cache.get(digest)
+        if image is None:
+            image = _draw_chart(df, fmt, **CHARTS[chart])
+            chart_cache.put(digest, image)
+        if version_key is not None:
+            chart_cache.put(version_key, digest)
+
+    if path is not None:
+        with open(path, "wb") as f:
+            f.write(image)
+    return image
+
+def _draw_chart(df, fmt, **options):
+    # a bare Figure, not pyplot: nothing is registered globally, no GUI backend is touched
+    import io
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=options.pop("figsize", None))
+    try:
+        df.plot(kind="bar", x="department", y="total_enrollments", ax=fig.subplots(), **options)
+        fig.tight_layout()
+        out = io.BytesIO()
+        fig.savefig(out, format=fmt)
+    finally:
+        fig.clear()
+    return out.getvalue()
+
+# --- QUERY PLANS ---
+
+# report queries with sample parameters, used by explain()
+REPORT_QUERIES = {
+    "course_roster": (QUERIES["course_roster"], {}),
+    "course_roster_counts": (QUERIES["course_roster_counts"], {}),
+    "course_roster_paged": (QUERIES["course_roster_paged"], {"limit": 50, "offset": 0}),
+    "course_roster_course": (QUERIES["course_roster_course"], {"course_code": 1}),
+    "student_timetable": (QUERIES["student_timetable"], {"student_id": 1}),
+    "iter_timetables": (QUERIES["iter_timetables"], {}),
+    "department_summary": (QUERIES["department_summary"], {}),
+    "plot_enrollment_by_department": (QUERIES["enrollment_by_department"], {}),
+    "analyze_enrollment_by_department": (QUERIES["enrollment_ranking"], {}),
+    "find_conflicts": (QUERIES["find_conflicts"], {}),
+}
+
+def explain(report=None):
+    """EXPLAIN QUERY PLAN for the report queries, flagging full-table scans"""
+    # The outer loop of a (sub)query may scan, those are the rows the report is over.
+    # A scan on an inner loop, or an AUTOMATIC index (SQLite scanning the table to
+    # build a throwaway index), means a join without a usable index.
+    plans = {}
+    for name, (query, params) in REPORT_QUERIES.items():
+        if report is not None and name != report:
+            continue
+
+        plan, scans, outer_seen, subqueries = [], [], set(), set()
+        for _, parent, _, detail in conn.execute("EXPLAIN QUERY PLAN " + query, params):
+            plan.append(detail)
+            if detail.startswith(("MATERIALIZE ", "CO-ROUTINE ")):
+                subqueries.add(detail.split()[1])
+            if not detail.startswith(("SCAN ", "SEARCH ")):
+                continue
+
+            table = detail.split()[1]
+            if "AUTOMATIC" in detail and table not in subqueries:
+                scans.append(detail)
+            elif detail.startswith("SCAN ") and "INDEX" not in detail and parent in outer_seen:
+                scans.append(detail)
+            outer_seen.add(parent)
+
+        plans[name] = {"plan": plan, "scans": scans}
+        print(f"{name}: " + ("ok" if not scans else "FULL SCAN " + "; ".join(scans)))
+    return plans
+
+# --- BULK IMPORT / EXPORT ---
+
+# foreign keys checked on import against the ids already in the database
+FOREIGN_KEYS = {
+    "departments": {},
+    "professors": {"dept_id": "departments"},
+    "students": {"dept_id": "departments"},
+    "courses": {"prof_id": "professors", "dept_id": "departments"},
+    "enrollments": {"student_id": "students", "course_code": "courses"},
+}
+# report queries that export_report() can stream to a file
+EXPORT_REPORTS = {
+    "course_roster": QUERIES["course_roster"],
+    "course_counts": QUERIES["course_roster_counts"],
+    "student_timetable": QUERIES["student_timetable"],
+    "department_summary": QUERIES["department_summary"],
+    "enrollment_by_department": QUERIES["enrollment_ranking"],
+}
+
+def _file_format(path, fmt=None):
+    fmt = fmt or ("parquet" if path.endswith((".parquet", ".pq")) else "csv")
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"unknown file format {fmt!r}, expected 'csv' or 'parquet'")
+    return fmt
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet import/export needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+def read_chunks(path, chunk_size=50000, fmt=None):
+    """Yields the rows of a CSV or Parquet file as lists of dicts, chunk_size at a time"""
+    if _file_format(path, fmt) == "parquet":
+        pa = _pyarrow()
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    import csv
+    with open(path, newline="", encoding="utf-8") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def _deferred_objects(table):
+    # the table's own indexes and triggers; automatic (UNIQUE/PK) indexes have no sql and stay,
+    # and so do the change_log triggers, downstream consumers have to see the loaded rows
+    return conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+        AND name NOT LIKE 'change\\_log\\_%' ESCAPE '\\'
+    """, (table,)).fetchall()
+
+def import_table(table, path, chunk_size=50000, defer=False, fmt=None):
+    """Streams a CSV or Parquet file into a table and returns the counts and rejected rows
+
+    Columns are matched by header name, the key column is optional. Rows with an
+    unknown foreign key, a bad integer or a constraint violation are skipped and
+    reported. defer=True drops the table's indexes and triggers for the load and
+    rebuilds them (and the ledgers they maintain) once at the end. Bulk loads
+    don't apply the unit cap, course capacity or the waitlist.
+    """
+    if table not in FOREIGN_KEYS:
+        raise ValueError(f"unknown table {table!r}")
+    types = {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    references = {column: {row[0] for row in conn.execute(f"SELECT {PRIMARY_KEYS[ref]} FROM {ref}")}
+                  for column, ref in FOREIGN_KEYS[table].items()}
+
+    stats = {"table": table, "rows": 0, "inserted": 0, "rejected": 0, "errors": []}
+
+    def reject(line, reason):
+        stats["rejected"] += 1
+        if len(stats["errors"]) < 100:
+            stats["errors"].append({"line": line, "reason": reason})
+
+    start = time.perf_counter()
+    deferred = []
+    # without defer every chunk commits on its own; with it the whole load is one
+    # transaction, so a failed load never leaves the table without its triggers
+    with conn.immediate():
+        if defer:
+            deferred = _deferred_objects(table)
+            for kind, name, _ in deferred:
+                conn.execute(f"DROP {kind.upper()} {name}")
+
+        columns = query = None
+        for chunk in read_chunks(path, chunk_size, fmt):
+            if columns is None:
+                columns = list(chunk[0])
+                unknown = [column for column in columns if column not in types]
+                if unknown:
+                    raise ValueError(f"{path}: unknown column(s) for {table}: {', '.join(unknown)}")
+                query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+            rows, lines = [], []
+            for row in chunk:
+                stats["rows"] += 1
+                values = []
+                for column in columns:
+                    value = row.get(column)
+                    if value == "":  # CSV has no NULL
+                        value = None
+                    if value is not None and types[column] == "INTEGER":
+                        try:
+                            value = int(value)
+                        except (TypeError, ValueError):
+                            break
+                    values.append(value)
+                if len(values) < len(columns):
+                    reject(stats["rows"], f"{column}: not an integer: {row.get(column)!r}")
+                    continue
+                missing = [(column, value) for column, value in zip(columns, values)
+                           if column in references and value is not None and value not in references[column]]
+                if missing:
+                    reject(stats["rows"], f"{missing[0][0]}={missing[0][1]} does not exist")
+                    continue
+                rows.append(values)
+                lines.append(stats["rows"])
+
+            # one executemany per chunk; if it hits a constraint the chunk is redone row by row
+            conn.execute("SAVEPOINT import_chunk")
+            try:
+                conn.executemany(query, rows)
+                stats["inserted"] += len(rows)
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK TO import_chunk")
+                for line, values in zip(lines, rows):
+                    try:
+                        conn.execute(query, values)
+                        stats["inserted"] += 1
+                    except sqlite3.IntegrityError as e:
+                        reject(line, str(e))
+            conn.execute("RELEASE import_chunk")
+            if not defer:
+                conn.commit()
+                conn.execute("BEGIN IMMEDIATE")
+
+            elapsed = time.perf_counter() - start
+            print(f"{table}: {stats['rows']} rows read, {stats['inserted']} inserted, "
+                  f"{stats['rejected']} rejected, {stats['rows'] / elapsed:.0f} rows/s")
+
+        for _, _, sql in deferred:
+            conn.execute(sql)
+        if defer:  # the data_version triggers were among the deferred ones
+            conn.run("bump_data_version")
+
+    # derived tables the deferred triggers (or store_course_slots) would have kept current
+    if table == "enrollments" and defer:
+        check_student_load()
+        refresh_dept_stats()
+        with conn:
+            conn.execute("""DELETE FROM waitlist WHERE EXISTS (SELECT 1 FROM enrollments e
+                            WHERE e.student_id = waitlist.student_id AND e.course_code = waitlist.course_code)""")
+    elif table == "courses":
+        if defer:
+            refresh_dept_stats()
+        sync_course_slots()
+        course_cache.clear()
+    if table in ("departments", "professors"):
+        CACHES[table].clear()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_s"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{table}: imported {stats['inserted']} of {stats['rows']} rows in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_s']:.0f} rows/s), {stats['rejected']} rejected")
+    return stats
+
+def _write_rows(path, cursor, chunk_size=50000, fmt=None, label=None):
+    # streams a cursor to CSV or Parquet, returns the row count
+    label = label or path
+    columns = [d[0] for d in cursor.description]
+    fmt = _file_format(path, fmt)
+    start, rows = time.perf_counter(), 0
+
+    if fmt == "parquet":
+        pa = _pyarrow()
+        writer = None
+        try:
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk and writer is not None:
+                    break
+                data = pa.table({column: [row[i] for row in chunk] for i, column in enumerate(columns)})
+                if writer is None:
+                    # a column that is all NULL in the first chunk can't fix its type yet
+                    schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                        for field in data.schema])
+                    writer = pa.parquet.ParquetWriter(path, schema)
+                writer.write_table(data.cast(writer.schema))
+                rows += len(chunk)
+                if not chunk:
+                    break
+                print(f"{label}: {rows} rows written, {rows / (time.perf_counter() - start):.0f} rows/s")
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        import csv
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            out = csv.writer(f)
+            out.writerow(columns)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                out.writerows(chunk)
+                rows += len(chunk)
+                print(f"{label}: {rows} rows written, {rows / (time.perf_counter() - start):.0f} rows/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"{label}: exported {rows} rows to {path} in {elapsed:.1f}s")
+    return {"rows": rows, "seconds": elapsed, "rows_per_s": rows / elapsed if elapsed else 0.0}
+
+def export_table(table, path, chunk_size=50000, fmt=None):
+    """Streams a whole table to CSV or Parquet in key order"""
+    if table not in PRIMARY_KEYS:
+        raise ValueError(f"unknown table {table!r}")
+    cursor = conn.execute(f"SELECT * FROM {table} ORDER BY {PRIMARY_KEYS[table]}")
+    return _write_rows(path, cursor, chunk_size, fmt, label=table)
+
+def _report_params(query, params):
+    # positional values (e.g. from the command line) go to the query's :names in order
+    if isinstance(params, dict):
+        return params
+    return dict(zip(dict.fromkeys(re.findall(r":(\w+)", query)), params))
+
+def export_report(report, path, params=(), chunk_size=50000, fmt=None):
+    """Streams a report query (see EXPORT_REPORTS) to CSV or Parquet"""
+    if report not in EXPORT_REPORTS:
+        raise ValueError(f"unknown report {report!r}, expected one of {', '.join(EXPORT_REPORTS)}")
+    query = EXPORT_REPORTS[report]
+    cursor = conn.execute(query, _report_params(query, params))
+    return _write_rows(path, cursor, chunk_size, fmt, label=report)
+
+def bulk_main(argv=None):
+    """python enrollment.py import|export|sweep|reports ..., see --help"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="enrollment.py", description="bulk CSV/Parquet import and export, orphan sweep")
+    parser.add_argument("--db", default="enrollment.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load = sub.add_parser("import", help="load a CSV or Parquet file into a table")
+    load.add_argument("table", choices=list(FOREIGN_KEYS))
+    load.add_argument("path")
+    load.add_argument("--chunk-size", type=int, default=50000)
+    load.add_argument("--defer", action="store_true", help="rebuild indexes and triggers after the load")
+    load.add_argument("--format", choices=["csv", "parquet"])
+
+    dump = sub.add_parser("export", help="write a table or report to CSV or Parquet")
+    dump.add_argument("source", choices=list(PRIMARY_KEYS) + list(EXPORT_REPORTS))
+    dump.add_argument("path")
+    dump.add_argument("--params", nargs="*", default=[], help="report parameters, e.g. a student_id")
+    dump.add_argument("--chunk-size", type=int, default=50000)
+    dump.add_argument("--format", choices=["csv", "parquet"])
+
+    sub.add_parser("sweep", help="delete or detach rows that reference missing rows (see sweep_orphans)")
+
+    reports = sub.add_parser("reports", help="run several reports concurrently on one snapshot")
+    reports.add_argument("reports", nargs="+", choices=list(EXPORT_REPORTS))
+    reports.add_argument("--params", nargs="*", default=[],
+                         help="parameters for the reports that take them, e.g. a student_id")
+    reports.add_argument("--out-dir", default=".")
+    reports.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    reports.add_argument("--workers", type=int)
+    reports.add_argument("--processes", action="store_true", help="a process pool instead of threads")
+
+    args = parser.parse_args(argv)
+    open_db(args.db)
+    if args.command == "import":
+        import_table(args.table, args.path, args.chunk_size, args.defer, args.format)
+    elif args.command == "sweep":
+        sweep_orphans()
+    elif args.command == "reports":
+        run_reports([(report, args.params) for report in args.reports], args.workers, args.out_dir,
+                    args.format, args.processes)
+    elif args.source in PRIMARY_KEYS:
+        export_table(args.source, args.path, args.chunk_size, args.format)
+    else:
+        export_report(args.source, args.path, args.params, args.chunk_size, args.format)
+
+# --- REPORT RUNNER ---
+
+def _run_report_group(path, specs, out_dir, fmt, started):
+    # runs in a pool worker: one read-only connection, one read transaction for all its specs.
+    # started is released once the snapshot is pinned; run_reports holds the write lock until then.
+    import os
+    from urllib.parse import quote
+    try:
+        connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+        connection.execute("BEGIN")
+        connection.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # the first read fixes the snapshot
+    finally:
+        started.release()
+
+    results = []
+    try:
+        for index, report, params in specs:
+            start = time.perf_counter()
+            cursor = connection.execute(EXPORT_REPORTS[report], params)
+            result = {"report": report, "params": params}
+            if out_dir is None:
+                result["frame"] = _frame(cursor)
+                result["rows"] = len(result["frame"])
+            else:
+                name = "_".join([report, *[str(value) for value in params.values()]])
+                result["path"] = os.path.join(out_dir, f"{name}.{fmt}")
+                result["rows"] = _write_rows(result["path"], cursor, fmt=fmt, label=name)["rows"]
+            result["seconds"] = time.perf_counter() - start
+            results.append((index, result))
+    finally:
+        connection.close()
+    return results
+
+def run_reports(specs, workers=None, out_dir=None, fmt="csv", processes=False):
+    """Runs several reports concurrently, all reading the same snapshot of the database
+
+    specs are EXPORT_REPORTS names or (name, params) pairs. The reports are dealt
+    out to workers threads (processes=True: processes), each with its own read-only
+    connection. A write lock is held while the workers open their read transactions,
+    so no commit can land in between. Returns one dict per spec, in order: report,
+    params, rows, seconds and the DataFrame ("frame"), or the file ("path") with out_dir.
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    if conn.path == ":memory:":
+        raise ValueError("run_reports needs a database file, other connections can't see :memory:")
+
+    jobs = []
+    for index, spec in enumerate(specs):
+        report, params = (spec, ()) if isinstance(spec, str) else spec
+        if report not in EXPORT_REPORTS:
+            raise ValueError(f"unknown report {report!r}, expected one of {', '.join(EXPORT_REPORTS)}")
+        params = _report_params(EXPORT_REPORTS[report], params)
+        missing = set(re.findall(r":(\w+)", EXPORT_REPORTS[report])) - set(params)
+        if missing:
+            raise ValueError(f"report {report!r} needs {', '.join(sorted(missing))}")
+        jobs.append((index, report, params))
+    if not jobs:
+        return []
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+        _file_format(f"x.{fmt}", fmt)  # fail on a bad format before starting any work
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    groups = [jobs[i::workers] for i in range(workers)]
+    start = time.perf_counter()
+
+    lock = sqlite3.connect(conn.path, timeout=conn.busy_timeout / 1000)
+    manager = None
+    try:
+        lock.execute("BEGIN IMMEDIATE")  # writers wait, readers don't
+        if processes:
+            import multiprocessing
+            manager = multiprocessing.Manager()
+            started = manager.Semaphore(0)
+            pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            started = threading.Semaphore(0)
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        with pool:
+            futures = [pool.submit(_run_report_group, conn.path, group, out_dir, fmt, started)
+                       for group in groups]
+            waiting = len(futures)
+            while waiting:
+                if started.acquire(timeout=0.05):
+                    waiting -= 1
+                elif all(future.done() for future in futures):  # a worker died before it got going
+                    break
+            lock.rollback()
+            results = dict(pair for future in futures for pair in future.result())
+    finally:
+        lock.close()
+        if manager is not None:
+            manager.shutdown()
+
+    results = [results[index] for index in range(len(jobs))]
+    for result in results:
+        print(f"{result['report']}{' ' + str(result['params']) if result['params'] else ''}: "
+              f"{result['rows']} rows in {result['seconds']:.2f}s")
+    print(f"Reports: {len(results)} on {workers} {'process' if processes else 'thread'}(s) "
+          f"in {time.perf_counter() - start:.2f}s")
+    return results
+
+# every CRUD method and report goes through instrumented() (a no-op check while disabled);
+# the iter_* generators are left alone, their time is spent in the caller's loop
+for _cls in (Department, Professor, Student, Course, Enrollment):
+    for _name, _attr in list(vars(_cls).items()):
+        if _name.startswith(("_", "iter_")):
+            continue
+        if isinstance(_attr, staticmethod):
+            setattr(_cls, _name, staticmethod(instrumented(f"{_cls.__name__}.{_name}")(_attr.__func__)))
+        elif callable(_attr):
+            setattr(_cls, _name, instrumented(f"{_cls.__name__}.{_name}")(_attr))
+for _name in ("course_roster", "student_timetable", "department_summary", "plot_enrollment_by_department",
+              "analyze_enrollment_by_department", "find_conflicts", "render_timetables", "build_snapshot",
+              "import_table", "export_table", "export_report", "check_student_load", "refresh_dept_stats",
+              "sweep_orphans", "run_reports"):
+    globals()[_name] = instrumented(_name)(globals()[_name])
+
+# --- ASYNC FACADE ---
+
+class AsyncEnrollment:
+    """Awaitable versions of the CRUD and report functions for asyncio callers
+
+    Calls run on a bounded thread pool, each worker thread using its own
+    connection from conn, so the event loop never waits on sqlite3 or pandas.
+    Identical reads already in flight are coalesced: 50 concurrent
+    student_timetable(42) calls run one query and all get the same result
+    object, so treat read results as read-only.
+    """
+    def __init__(self, max_workers=8):
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enrollment")
+        self.inflight = {}  # (loop, generation, name, args) -> future of the running read
+        self.coalesced = 0
+        self.generation = 0  # writes completed; a read only joins reads issued since the last one
+
+    async def call(self, fn, *args, **kwargs):
+        import asyncio
+        from functools import partial
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def read(self, name, fn, *args, **kwargs):
+        import asyncio
+        key = (asyncio.get_running_loop(), self.generation, name, args, tuple(sorted(kwargs.items())))
+        try:
+            future = self.inflight.get(key)
+        except TypeError:  # unhashable arguments (e.g. a columns list), just run it
+            return await self.call(fn, *args, **kwargs)
+
+        if future is None:
+            future = asyncio.ensure_future(self.call(fn, *args, **kwargs))
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller being cancelled must not cancel the query for the others
+        return await asyncio.shield(future)
+
+    def close(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        # the workers have exited (with wait=False, the next new connection reaps them)
+        conn.close_stale()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+# the CRUD surface AsyncEnrollment and Session expose by name; reads are coalesced
+# by AsyncEnrollment, writes always run; the get_<plural>(self, ...) methods get None for self
+API_READS = {
+    "get_dept": Department.get_dept,
+    "get_depts": lambda *args, **kwargs: Department.get_depts(None, *args, **kwargs),
+    "get_prof": Professor.get_prof,
+    "get_profs": lambda *args, **kwargs: Professor.get_profs(None, *args, **kwargs),
+    "get_student": Student.get_student,
+    "get_students": lambda *args, **kwargs: Student.get_students(None, *args, **kwargs),
+    "get_course": Course.get_course,
+    "get_courses": lambda *args, **kwargs: Course.get_courses(None, *args, **kwargs),
+    "get_enrollment": Enrollment.get_enrollment,
+    "get_enrollments": lambda *args, **kwargs: Enrollment.get_enrollments(None, *args, **kwargs),
+    "get_waitlist": Enrollment.get_waitlist,
+    "course_roster": course_roster,
+    "student_timetable": student_timetable,
+    "department_summary": department_summary,
+    "find_conflicts": find_conflicts,
+}
+API_WRITES = {
+    fn.__name__: fn for fn in (
+        Department.add_dept, Department.add_depts, Department.update_dept, Department.update_depts,
+        Department.del_dept, Department.del_depts,
+        Professor.add_prof, Professor.add_profs, Professor.update_prof, Professor.update_profs,
+        Professor.del_prof, Professor.del_profs,
+        Student.add_student, Student.add_students, Student.update_student, Student.update_students,
+        Student.del_student, Student.del_students,
+        Course.add_course, Course.add_courses, Course.update_course, Course.update_courses,
+        Course.set_capacity, Course.del_course, Course.del_courses,
+        Enrollment.add_enrollment, Enrollment.add_enrollments, Enrollment.leave_waitlist,
+        Enrollment.del_enrollment, Enrollment.del_enrollments,
+    )
+}
+# the plotting reports stay synchronous, matplotlib figures don't belong on worker threads
+
+def _async_read(name, fn):
+    async def method(self, *args, **kwargs):
+        return await self.read(name, fn, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+def _async_write(name, fn):
+    async def method(self, *args, **kwargs):
+        try:
+            return await self.call(fn, *args, **kwargs)
+        finally:
+            # reads issued from now on must see this write, not join one started before it
+            self.generation += 1
+    method.__name__ = name
+    return method
+
+for _name, _fn in API_READS.items():
+    setattr(AsyncEnrollment, _name, _async_read(_name, _fn))
+for _name, _fn in API_WRITES.items():
+    setattr(AsyncEnrollment, _name, _async_write(_name, _fn))
+
+# --- SESSIONS ---
+
+class OpResult(Record):
+    """What one Session operation did, in place of the text the method printed"""
+    __slots__ = ("op", "ok", "value", "changes", "message", "error", "rolled_back")
+
+    def __init__(self, op, ok, value=None, changes=0, message="", error=None, rolled_back=False):
+        self.op = op
+        self.ok = ok
+        self.value = value  # what the method returned, the new id for the single add_* methods
+        self.changes = changes  # rows changed, trigger-maintained tables included
+        self.message = message
+        self.error = error
+        self.rolled_back = rolled_back
+
+class Session:
+    """Unit of work: the CRUD calls made through it share one transaction and one commit
+
+        with Session() as session:
+            physics = session.add_dept("Physics").value
+            session.add_prof("Ada", physics)
+            with session.savepoint():  # all or nothing, an exception here only undoes this block
+                ...
+        session.results  # [OpResult, ...]
+
+    Each operation runs in its own savepoint, so a failing one is rolled back and
+    recorded without undoing the others (strict=True raises instead, rolling back
+    the whole session). Any CRUD method can be called on the session by name
+    (see API_READS/API_WRITES) or passed to run(). What the methods print is
+    captured into OpResult.message; stdout is redirected while an operation runs,
+    so output from other threads at that moment ends up there too.
+    """
+    def __init__(self, strict=False):
+        self.strict = strict
+        self.results = []
+
+    def __enter__(self):
+        if getattr(conn._local, "session", None) is not None:
+            raise RuntimeError("a Session is already open on this thread")
+        conn.execute("BEGIN IMMEDIATE")
+        conn._local.session = self
+        conn._local.savepoints = 0
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        conn._local.session = None
+        if exc_type is None:
+            conn.commit()
+            return False
+        conn.rollback()
+        for result in self.results:
+            result.rolled_back = True
+        for cache in CACHES.values():  # may hold rows read inside the rolled back transaction
+            cache.clear()
+        return False
+
+    def run(self, fn, *args, **kwargs):
+        """Calls a CRUD method inside its own savepoint and returns an OpResult"""
+        from inspect import unwrap
+        return self._run(getattr(unwrap(fn), "__qualname__", repr(fn)), fn, args, kwargs)
+
+    def _run(self, name, fn, args, kwargs):
+        import io
+        from contextlib import redirect_stdout
+        connection = conn.connect()
+        changes = connection.total_changes
+        out = io.StringIO()
+        try:
+            with conn.savepoint(), redirect_stdout(out):
+                value = fn(*args, **kwargs)
+        except Exception as e:
+            result = OpResult(name, False, message=out.getvalue().strip(), error=f"{type(e).__name__}: {e}")
+            self.results.append(result)
+            if self.strict:
+                raise
+            return result
+        # add_enrollment reports a denial by returning False, the rest raise
+        result = OpResult(name, value is not False, value, connection.total_changes - changes,
+                          out.getvalue().strip())
+        self.results.append(result)
+        return result
+
+    @contextmanager
+    def savepoint(self):
+        """Groups operations: an exception inside undoes all of them and propagates"""
+        mark = len(self.results)
+        try:
+            with conn.savepoint():
+                yield self
+        except BaseException:
+            for result in self.results[mark:]:
+                result.rolled_back = True
+            raise
+
+    def __getattr__(self, name):
+        # session.add_student(...) == session.run(Student.add_student, ...)
+        fn = API_WRITES.get(name) or API_READS.get(name)
+        if fn is None:
+            raise AttributeError(f"Session has no operation {name!r}")
+        return lambda *args, **kwargs: self._run(name, fn, args, kwargs)
+
+    def summary(self):
+        return {"operations": len(self.results),
+                "ok": sum(r.ok and not r.rolled_back for r in self.results),
+                "failed": sum(not r.ok for r in self.results),
+                "rolled_back": sum(r.rolled_back for r in self.results)}
+
+#TESTING
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:  # python enrollment.py import students students.csv
+        bulk_main()
+        sys.exit()
+
+    open_db()
+
+    Student.del_student(8)
+    #readding student chnages in number due to autoincrement
+    Student.add_student("Heidi Clark", 19, 2)
+
+    Student.get_students(0)